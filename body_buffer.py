@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class BodyBuffer:
+    """
+    Class that hands the body vector from the pose estimation thread to the control loop without locks.
+    Two preallocated buffers are used: the writer fills the back buffer and publishes it by increasing a sequence
+    number, readers always look at the front buffer (seqlock-style, single writer).
+    Each published vector carries the id and the capture time of the frame it was estimated from, whether the pose
+    was detected in that frame (if not, the last valid vector is held), the detection score and the capture time of
+    the last frame where the pose was detected
+    """
+
+    def __init__(self, size, dtype=np.float32):
+        self._buffers = np.zeros((2, size), dtype=dtype)
+        self._frame_id = [0, 0]
+        self._timestamp = [0.0, 0.0]
+        self._detected = [False, False]
+        self._score = [0.0, 0.0]
+        self._t_valid = [0.0, 0.0]
+        self._seq = 0
+
+    @property
+    def size(self):
+        return self._buffers.shape[1]
+
+    @property
+    def seq(self):
+        """number of vectors published so far"""
+        return self._seq
+
+    @property
+    def back(self):
+        """buffer the writer has to fill before calling publish(). Only the writer thread may use it"""
+        return self._buffers[(self._seq + 1) & 1]
+
+    def publish(self, frame_id, timestamp, detected=True, score=1.0):
+        """
+        make the back buffer visible to the readers
+        :param frame_id: id of the frame the body vector was estimated from
+        :param timestamp: capture time of that frame (time.perf_counter, seconds)
+        :param detected: whether the pose was detected in the frame (use publish_missed() when it was not)
+        :param score: confidence of the detection [0, 1]
+        :return:
+        """
+        idx = (self._seq + 1) & 1
+        self._frame_id[idx] = frame_id
+        self._timestamp[idx] = timestamp
+        self._detected[idx] = detected
+        self._score[idx] = score
+        self._t_valid[idx] = timestamp if detected else self._t_valid[idx ^ 1]
+        self._seq += 1
+
+    def publish_missed(self, frame_id, timestamp):
+        """
+        publish that the pose was not detected in a frame. The last valid vector is held in the new front buffer
+        :param frame_id: id of the frame
+        :param timestamp: capture time of the frame (time.perf_counter, seconds)
+        :return:
+        """
+        front = self._seq & 1
+        np.copyto(self._buffers[front ^ 1], self._buffers[front])
+        self.publish(frame_id, timestamp, detected=False, score=0.0)
+
+    def read(self, out=None):
+        """
+        get the latest body vector without blocking the writer. A consistent copy is always returned (the read is
+        retried if the writer published in the meantime): the front buffer becomes the back buffer at the next
+        publish and is overwritten in place, so it is never handed out
+        :param out: preallocated array the vector is copied into. If None, a new array is allocated
+        :return: body vector, frame id, capture timestamp
+        """
+        if out is None:
+            out = np.empty((self.size,), dtype=self._buffers.dtype)
+        while True:
+            seq = self._seq
+            idx = seq & 1
+            frame_id = self._frame_id[idx]
+            timestamp = self._timestamp[idx]
+            np.copyto(out, self._buffers[idx])
+            if self._seq == seq:
+                return out, frame_id, timestamp
+
+    def read_detection(self, out=None):
+        """
+        same as read(), with the detection state of the frame
+        :param out: preallocated array the vector is copied into (see read()). If None, a new array is allocated
+        :return: body vector, frame id, capture timestamp, detected, detection score, capture time of the last frame
+        where the pose was detected (0 if never)
+        """
+        if out is None:
+            out = np.empty((self.size,), dtype=self._buffers.dtype)
+        while True:
+            seq = self._seq
+            idx = seq & 1
+            frame_id = self._frame_id[idx]
+            timestamp = self._timestamp[idx]
+            detected = self._detected[idx]
+            score = self._score[idx]
+            t_valid = self._t_valid[idx]
+            np.copyto(out, self._buffers[idx])
+            if self._seq == seq:
+                return out, frame_id, timestamp, detected, score, t_valid
@@ -0,0 +1,155 @@
+import numpy as np
+
+
+def load_bomi_map(dr_mode, drPath):
+    # pandas is imported when a map is loaded, not when the GUI starts
+    import pandas as pd
+
+    if dr_mode == 'pca':
+        map = pd.read_csv(drPath + 'weights1.txt', sep=' ', header=None).values
+    elif dr_mode == 'ae':
+        ws = []
+        bs = []
+        ws.append(pd.read_csv(drPath + 'weights1.txt', sep=' ', header=None).values)
+        ws.append(pd.read_csv(drPath + 'weights2.txt', sep=' ', header=None).values)
+        ws.append(pd.read_csv(drPath + 'weights3.txt', sep=' ', header=None).values)
+        bs.append(pd.read_csv(drPath + 'biases1.txt', sep=' ', header=None).values)
+        bs[0] = bs[0].reshape((bs[0].size,))
+        bs.append(pd.read_csv(drPath + 'biases2.txt', sep=' ', header=None).values)
+        bs[1] = bs[1].reshape((bs[1].size,))
+        bs.append(pd.read_csv(drPath + 'biases3.txt', sep=' ', header=None).values)
+        bs[2] = bs[2].reshape((bs[2].size,))
+
+        map = (ws, bs)
+
+    return map
+
+
+def load_transform(drPath, kind):
+    """
+    read rotation, scale and offset saved after training (kind='dr') or after customization (kind='custom')
+    :param drPath: path where the BoMI forward map is saved
+    :param kind: 'dr' or 'custom'
+    :return: rotation [deg], scale, offset
+    """
+    import pandas as pd
+
+    rot = pd.read_csv(drPath + 'rotation_' + kind + '.txt', sep=' ', header=None).values
+    scale = pd.read_csv(drPath + 'scale_' + kind + '.txt', sep=' ', header=None).values
+    scale = np.reshape(scale, (scale.shape[0],))
+    off = pd.read_csv(drPath + 'offset_' + kind + '.txt', sep=' ', header=None).values
+    off = np.reshape(off, (off.shape[0],))
+
+    return float(np.ravel(rot)[0]), scale, off
+
+
+def rotation_matrix(rot, n):
+    """
+    matrix R such that cu @ R applies the rotation of the first two coordinates of cu as done in reaching_functions:
+    cu[0] = cu[0] * cos - cu[1] * sin, then cu[1] = cu[0] * sin + cu[1] * cos (with the already rotated cu[0])
+    :param rot: rotation [deg]
+    :param n: number of coordinates of cu
+    :return: R (n x n)
+    """
+    c = np.cos(np.pi / 180 * rot)
+    s = np.sin(np.pi / 180 * rot)
+    R = np.eye(n)
+    R[0, 0] = c
+    R[1, 0] = -s
+    R[0, 1] = s * c
+    R[1, 1] = c - s * s
+    return R
+
+
+class BomiMap:
+    """
+    Class that applies the BoMI forward map (PCA or AE) to the body vector.
+    The chain of rotation/scale/offset computed after training and customization is folded once into the weights
+    of the last layer, so that at every tick the map costs one (PCA) or three (AE) matrix products written into
+    preallocated buffers
+    """
+
+    def __init__(self, map, transforms=()):
+        """
+        :param map: BoMI forward map as returned by load_bomi_map (PCA weights or tuple of AE weights and biases)
+        :param transforms: sequence of (rot, scale, off) applied in order to the output of the map. rot can be None
+        """
+        if type(map) != tuple:
+            ws = [np.asarray(map, dtype=float)]
+            bs = [np.zeros((ws[0].shape[1],))]
+        else:
+            ws = [np.asarray(w, dtype=float) for w in map[0]]
+            bs = [np.reshape(np.asarray(b, dtype=float), (-1,)) for b in map[1]]
+
+        # fold the affine transforms into the last layer: y = (h @ W + b) @ M + c
+        n_out = ws[-1].shape[1]
+        M = np.eye(n_out)
+        c = np.zeros((n_out,))
+        for rot, scale, off in transforms:
+            if rot is not None:
+                R = rotation_matrix(rot, n_out)
+                M = M @ R
+                c = c @ R
+            scale = np.broadcast_to(np.asarray(scale, dtype=float), (n_out,))
+            M = M * scale
+            c = c * scale + np.broadcast_to(np.asarray(off, dtype=float), (n_out,))
+
+        self._ws = ws[:-1] + [np.ascontiguousarray(ws[-1] @ M)]
+        self._bs = bs[:-1] + [bs[-1] @ M + c]
+
+        # preallocated buffers for online inference
+        self._hidden = [np.zeros((w.shape[1],)) for w in self._ws[:-1]]
+        self._out = np.zeros((n_out,))
+
+    @classmethod
+    def from_files(cls, dr_mode, drPath, custom=True, rotate=False):
+        """
+        build the map from the files saved after training and (optionally) customization
+        :param dr_mode: 'pca' or 'ae'
+        :param drPath: path where the BoMI forward map is saved
+        :param custom: apply also the customization values (practice)
+        :param rotate: apply the saved rotations (customization applies rotation_dr, practice does not)
+        :return: object of BomiMap
+        """
+        map = load_bomi_map(dr_mode, drPath)
+        rot_dr, scale_dr, off_dr = load_transform(drPath, 'dr')
+        transforms = [(rot_dr if rotate else None, scale_dr, off_dr)]
+        if custom:
+            rot_custom, scale_custom, off_custom = load_transform(drPath, 'custom')
+            transforms.append((rot_custom if rotate else None, scale_custom, off_custom))
+        return cls(map, transforms)
+
+    @property
+    def n_inputs(self):
+        return self._ws[0].shape[0]
+
+    @property
+    def n_outputs(self):
+        return self._out.shape[0]
+
+    def forward(self, body):
+        """
+        apply the map to a single body vector
+        :param body: body vector (n_inputs,)
+        :return: output of the map (n_outputs,). The array is reused at the next call
+        """
+        x = body
+        for w, b, h in zip(self._ws[:-1], self._bs[:-1], self._hidden):
+            np.dot(x, w, out=h)
+            h += b
+            np.tanh(h, out=h)
+            x = h
+        np.dot(x, self._ws[-1], out=self._out)
+        self._out += self._bs[-1]
+        return self._out
+
+    def transform(self, body):
+        """
+        apply the map to a batch of body vectors (offline analysis)
+        :param body: array (N x n_inputs)
+        :return: array (N x n_outputs)
+        """
+        x = np.asarray(body, dtype=float)
+        for w, b in zip(self._ws[:-1], self._bs[:-1]):
+            x = np.tanh(x @ w + b)
+        return x @ self._ws[-1] + self._bs[-1]
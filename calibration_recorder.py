@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+
+CALIB_FILE = "Calib.npz"
+LEGACY_CALIB_FILE = "Calib.txt"
+
+
+class CalibrationRecorder:
+    """
+    Class that stores the body vectors collected during calibration in a preallocated array (sized from the duration
+    and the sampling rate, doubled if it ever gets full) together with the id and capture time of their frames.
+    Mean and covariance are updated at each sample (Welford), so PCA can be fitted as soon as calibration ends
+    without another pass over the data. Samples are saved in a binary npz file with the metadata of the session
+    """
+
+    def __init__(self, size, duration, rate=50, joints=None):
+        """
+        :param size: length of the body vector
+        :param duration: duration of the calibration [ms]
+        :param rate: highest number of samples per second (rate of the calibration loop)
+        :param joints: joints selected in the main window (saved with the samples)
+        """
+        capacity = int(np.ceil(duration / 1000 * rate)) + 1
+        self._body = np.zeros((capacity, size))
+        self._frame_id = np.zeros((capacity,), dtype=np.int64)
+        self._timestamp = np.zeros((capacity,))
+        self._n = 0
+        self._rate = rate
+        self._duration = duration
+        self._joints = None if joints is None else np.asarray(joints)
+
+        self._mean = np.zeros((size,))
+        self._m2 = np.zeros((size, size))
+        self._delta = np.zeros((size,))
+        self._delta2 = np.zeros((size,))
+        self._outer = np.zeros((size, size))
+
+    @property
+    def size(self):
+        return self._body.shape[1]
+
+    @property
+    def n(self):
+        """number of samples recorded"""
+        return self._n
+
+    @property
+    def body(self):
+        """samples recorded so far (n x size). View of the internal storage"""
+        return self._body[:self._n]
+
+    @property
+    def frame_id(self):
+        return self._frame_id[:self._n]
+
+    @property
+    def timestamp(self):
+        return self._timestamp[:self._n]
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def covariance(self):
+        """sample covariance of the samples recorded so far (size x size)"""
+        if self._n < 2:
+            return np.zeros_like(self._m2)
+        return self._m2 / (self._n - 1)
+
+    def _grow(self):
+        capacity = 2 * self._body.shape[0]
+        for name in ('_body', '_frame_id', '_timestamp'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def append(self, body, frame_id, timestamp):
+        """
+        store a sample and update mean and covariance
+        :param body: body vector
+        :param frame_id: id of the frame it was estimated from
+        :param timestamp: capture time of that frame (time.perf_counter, seconds)
+        :return:
+        """
+        if self._n == self._body.shape[0]:
+            self._grow()
+        x = self._body[self._n]
+        x[:] = body
+        self._frame_id[self._n] = frame_id
+        self._timestamp[self._n] = timestamp
+        self._n += 1
+
+        # Welford: mean += delta / n, m2 += delta (x - mean)^T
+        np.subtract(x, self._mean, out=self._delta)
+        self._mean += self._delta / self._n
+        np.subtract(x, self._mean, out=self._delta2)
+        np.multiply.outer(self._delta, self._delta2, out=self._outer)
+        self._m2 += self._outer
+
+    def fit_pca(self, n_pc=3):
+        """
+        principal components of the samples recorded so far, from the running covariance
+        :param n_pc: number of components
+        :return: components (n_pc x size, as sklearn's components_), explained variance ratio of each component
+        """
+        eigval, eigvec = np.linalg.eigh(self.covariance)
+        order = np.argsort(eigval)[::-1][:n_pc]
+        total = np.sum(eigval)
+        ratio = eigval[order] / total if total > 0 else np.zeros((n_pc,))
+        return eigvec[:, order].T, ratio
+
+    def save(self, path):
+        """
+        :param path: output npz file (e.g. calibPath + CALIB_FILE)
+        :return:
+        """
+        metadata = {} if self._joints is None else {'joints': self._joints}
+        np.savez(path, body=self.body, frame_id=self.frame_id, timestamp=self.timestamp, mean=self._mean,
+                 covariance=self.covariance, rate=self._rate, duration=self._duration, **metadata)
+
+
+def calibration_exists(calibPath):
+    return os.path.isfile(calibPath + CALIB_FILE) or os.path.isfile(calibPath + LEGACY_CALIB_FILE)
+
+
+def load_calibration(calibPath):
+    """
+    read the calibration samples (Calib.npz, or Calib.txt saved by older versions) and remove the rows with zeros
+    (samples taken before the first detection)
+    :param calibPath: folder of the calibration
+    :return: body samples (N x size)
+    """
+    if os.path.isfile(calibPath + CALIB_FILE):
+        with np.load(calibPath + CALIB_FILE) as data:
+            x = data['body']
+    else:
+        x = np.loadtxt(calibPath + LEGACY_CALIB_FILE, ndmin=2)
+    return x[np.all(x != 0, axis=1)]
@@ -3,7 +3,7 @@ import numpy as np
 import pandas as pd
 import os
 import itertools
-from ae_package import pca
+from compute_bomi_map import PrincipalComponentAnalysis
 # from ae_package import autoencoder2_0
 from ae_package import useful_functions
 from scipy.optimize import curve_fit
@@ -1392,7 +1392,7 @@ def compute_vaf_time(df, names, idx):
 
     # import pca and autoencoder from ae_package
     AE = autoencoder2_0.Autoencoder(1000, 0.02, 2, struc="non_linear", nh1=8)
-    PCA = pca.PrincipalComponentAnalysis(2)
+    PCA = PrincipalComponentAnalysis(2)
     col_imu = ['imu00', 'imu01', 'imu02', 'imu03', 'imu10', 'imu11', 'imu12', 'imu13']
 
     fs = 50  # sampling rate
@@ -1405,21 +1405,28 @@ def compute_vaf_time(df, names, idx):
         # get imu array for current subject
         imu_tot = df.loc[idx[sub+1], col_imu].values
 
+        # windows: baseline, every tot minute after baseline and last tot minute of training
+        baseline = imu_tot[0:int(x_range/2), :]
+        training = imu_tot[int(x_range/2):, :]
+        windows = [baseline] + [training[i*x_range:(i+1)*x_range, :] for i in range(int(np.ceil(len(training) / x_range)))] \
+            + [training[-int(x_range / 2):, :]]
+
+        # PCA of all the windows in a single call
+        windows_rec_pca, _ = PCA.train_pca_batch(windows)
+        for imu, imu_rec_pca in zip(windows, windows_rec_pca):
+            vaf_pca.append(useful_functions.compute_vaf(imu, imu_rec_pca) * 100)
+
         # compute vaf for baseline
-        imu = imu_tot[0:int(x_range/2), :]
-        imu_rec_pca = PCA.train_pca(imu)
-        vaf_pca.append(useful_functions.compute_vaf(imu, imu_rec_pca) * 100)
+        imu = baseline
         _, _, imu_rec_ae, _ = AE.train_network(imu)
         vaf_ae.append(useful_functions.compute_vaf(imu, imu_rec_ae) * 100)
 
         # remove baseline
-        imu_tot = imu_tot[int(x_range/2):, :]
+        imu_tot = training
 
-        # compute PCA every tot minute after baseline
-        for i in range(int(len(imu_tot) / x_range)+1):
+        # compute AE every tot minute after baseline
+        for i in range(int(np.ceil(len(imu_tot) / x_range))):
             imu = imu_tot[i*x_range:(i+1)*x_range, :]
-            imu_rec_pca = PCA.train_pca(imu)
-            vaf_pca.append(useful_functions.compute_vaf(imu, imu_rec_pca) * 100)
             _, _, imu_rec_ae, _ = AE.train_network(imu)
             vaf_ae.append(useful_functions.compute_vaf(imu, imu_rec_ae) * 100)
 
@@ -1429,8 +1436,6 @@ def compute_vaf_time(df, names, idx):
 
         # compute vaf for last tot minute of training
         imu = imu_tot[-int(x_range / 2):, :]
-        imu_rec_pca = PCA.train_pca(imu)
-        vaf_pca.append(useful_functions.compute_vaf(imu, imu_rec_pca) * 100)
         _, _, imu_rec_ae, _ = AE.train_network(imu)
         vaf_ae.append(useful_functions.compute_vaf(imu, imu_rec_ae) * 100)
 
@@ -1475,7 +1480,7 @@ def compute_vaf_trial(df, names, trial_list, trials_pca, idx):
 
     # import pca and autoencoder from ae_package
     AE = autoencoder2_0.Autoencoder(1000, 0.02, 2, struc="non_linear", nh1=8)
-    PCA = pca.PrincipalComponentAnalysis(2)
+    PCA = PrincipalComponentAnalysis(2)
     col_imu = ['imu00', 'imu01', 'imu02', 'imu03', 'imu10', 'imu11', 'imu12', 'imu13']
 
     for sub in range(len(names)):
@@ -1489,7 +1494,7 @@ def compute_vaf_trial(df, names, trial_list, trials_pca, idx):
 
         # compute vaf for baseline
         imu = imu[0:3000, :]
-        imu_rec_pca = PCA.train_pca(imu)
+        _, imu_rec_pca, _ = PCA.train_pca(imu)
         # vaf.append(useful_functions.compute_vaf(imu, imu_rec_pca) * 100)
 
         # remove baseline
@@ -1519,7 +1524,7 @@ def compute_vaf_trial(df, names, trial_list, trials_pca, idx):
                         # append IMU data
                         imu_tot = np.append(imu_tot, imu, axis=0)
                     else:
-                        imu_rec_pca = PCA.train_pca(imu_tot)
+                        _, imu_rec_pca, _ = PCA.train_pca(imu_tot)
                         # _, _, imu_rec_pca, _ = AE.train_network(imu_tot)
                         vaf.append(useful_functions.compute_vaf(imu_tot, imu_rec_pca) * 100)
                         count_trial = 0
@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+
+from body_buffer import BodyBuffer
+from latency import CAPTURE, MAP
+import kinematics
+import reaching_functions
+
+# limits of the angular velocities [deg per NOMINAL_DT]
+MAX_ANGLE_VELOCITY = 5
+MIN_ANGLE_VELOCITY = -5
+
+# the BoMI map outputs were tuned as degrees per tick of the original 50 Hz loop
+NOMINAL_DT = 20  # [ms]
+
+
+def interpolate_angles(theta_prev, theta_curr, alpha, out=None):
+    """
+    interpolate link angles along the shortest path (so that 359 -> 1 goes through 0, not backwards)
+    :param theta_prev: angles at the previous control step [deg]
+    :param theta_curr: angles at the current control step [deg]
+    :param alpha: 0 gives theta_prev, 1 gives theta_curr
+    :param out: optional array where the result is written
+    :return: interpolated angles, wrapped in [0, 360)
+    """
+    delta = np.mod(theta_curr - theta_prev + 180, 360) - 180
+    return kinematics.wrap_angles(theta_prev + alpha * delta, out=out)
+
+
+class ArmController:
+    """
+    Class that runs the control of the 3-link arm at a fixed rate, independent of the render loop.
+    At each step the latest body vector is mapped into angular velocities, which are integrated over the measured
+    time step (so the gain does not depend on the rate or on late steps), then the cursor position and the reaching
+    state machine are updated. The last two arm states are published through a BodyBuffer, so the render loop can
+    interpolate between them at its own rate without locks
+    """
+
+    def __init__(self, r, bomi_map, shared_body, timer_enter_tgt, timer_start_trial, timer_practice, rate=100,
+                 latency=None, log_queue=None, mouse_enabled=False, detection=None):
+        """
+        :param r: object of Reaching class
+        :param bomi_map: object of BomiMap
+        :param shared_body: BodyBuffer written by the pose estimation thread
+        :param timer_enter_tgt: stopwatch of the time inside the target
+        :param timer_start_trial: stopwatch of the time from the start of the trial
+        :param timer_practice: stopwatch of the practice
+        :param rate: control rate [Hz]
+        :param latency: optional LatencyMonitor where the map stage is marked
+        :param log_queue: optional SessionLogQueue where one record per step is pushed
+        :param mouse_enabled: only map the body vector (the computer cursor is moved by the render loop)
+        :param detection: optional MissingDetectionPolicy applied when the hand was not detected (default: hold)
+        """
+        self._r = r
+        # map and its version are swapped together in one assignment (see set_map)
+        self._map = (bomi_map, 0)
+        self._shared_body = shared_body
+        self._timer_enter_tgt = timer_enter_tgt
+        self._timer_start_trial = timer_start_trial
+        self._timer_practice = timer_practice
+        self._period = 1.0 / rate
+        self._latency = latency
+        self._log_queue = log_queue
+        self._mouse_enabled = mouse_enabled
+        self._detection = detection
+        self._zero = np.zeros((3,))
+        # snapshot of the body vector read at each step (owned by the control thread)
+        self._body = np.zeros((shared_body.size,))
+
+        self._theta = np.zeros((3,))
+        self._base = kinematics.arm_base(r.width, r.height)
+        self._joints_pos = np.empty((4, 2))
+
+        # previous angles, current angles and duration of the last step [s]; timestamp: time of the current step
+        self._states = BodyBuffer(7, dtype=np.float64)
+        self._render_state = np.zeros((7,))
+        self._steps = 0
+        self._late_steps = 0
+
+    @property
+    def rate(self):
+        return 1.0 / self._period
+
+    @property
+    def steps(self):
+        return self._steps
+
+    @property
+    def late_steps(self):
+        """number of steps that started more than one period late"""
+        return self._late_steps
+
+    @property
+    def theta(self):
+        return self._theta
+
+    @property
+    def bomi_map(self):
+        return self._map[0]
+
+    @property
+    def map_version(self):
+        return self._map[1]
+
+    def set_map(self, bomi_map, version):
+        """
+        replace the BoMI map (e.g. from the map update thread). The new map is used from the next step
+        :param bomi_map: object of BomiMap with the same number of inputs and outputs
+        :param version: version number logged with every step that uses the map
+        :return:
+        """
+        self._map = (bomi_map, version)
+
+    def step(self, dt):
+        """
+        one control step
+        :param dt: time elapsed since the previous step [ms]
+        :return:
+        """
+        r = self._r
+        bomi_map, map_version = self._map
+
+        # Copy old cursor position
+        r.old_crs_x = r.crs_anchor_x
+        r.old_crs_y = r.crs_anchor_y
+
+        # get current value of body and apply BoMI forward map to obtain the 3 angular velocities
+        r.body, r.frame_id, r.t_capture, detected, r.detection_score, t_valid = self._shared_body.read_detection(self._body)
+        r.detected = int(detected)
+        body_log = r.body.tolist() if self._log_queue is not None else None
+        if self._detection is None:
+            body = r.body
+            r.body_age = (time.perf_counter() - t_valid) * 1000 if t_valid > 0 else 0
+        else:
+            body = self._detection.update(r.body, detected, t_valid)
+            r.body_age = self._detection.age
+        if body is None:
+            # hand lost: the arm stops (and the computer cursor stays where it is)
+            omega = self._zero
+            if not self._mouse_enabled:
+                r.crs_x, r.crs_y, r.crs_z = 0, 0, 0
+        else:
+            omega = np.clip(bomi_map.forward(body), MIN_ANGLE_VELOCITY, MAX_ANGLE_VELOCITY)
+            r.crs_x, r.crs_y, r.crs_z = omega.tolist()
+        if self._latency is not None:
+            # capture time travels with the body vector (kept only if the pose thread did not mark it already),
+            # so the end-to-end latency is measured also when pose estimation runs in another process
+            self._latency.mark(CAPTURE, r.frame_id, r.t_capture)
+            self._latency.mark(MAP, r.frame_id)
+
+        if not self._mouse_enabled:
+            # integrate the angular velocities over the measured time step
+            self._theta += omega * (dt / NOMINAL_DT)
+            kinematics.wrap_angles(self._theta, out=self._theta)
+            r.theta1, r.theta2, r.theta3 = self._theta.tolist()
+
+            kinematics.forward_kinematics(self._theta, r.link_length, self._base, out=self._joints_pos)
+            r.crs_anchor_x, r.crs_anchor_y = self._joints_pos[-1].tolist()
+
+            # update target and check whether the cursor reached it (and for how long)
+            reaching_functions.set_target_reaching(r)
+            reaching_functions.check_target_reaching_links(r, self._timer_enter_tgt, dt)
+            reaching_functions.check_time_reaching_links(r, self._timer_enter_tgt, self._timer_start_trial,
+                                                         self._timer_practice)
+
+        if self._log_queue is not None:
+            # log exactly one record per step, tagged with the frame the pose was estimated from
+            self._log_queue.push((self._timer_practice.elapsed_time, r.reach_time, *body_log,
+                                  r.theta1, r.theta2, r.theta3, r.crs_x, r.crs_y, r.crs_z, r.crs_anchor_x,
+                                  r.crs_anchor_y, r.target, r.trial, r.state, r.comeback, r.at_home, r.score,
+                                  r.distance, r.epoch, r.frame_id, r.t_capture, r.detected, r.detection_score,
+                                  r.body_age, map_version))
+
+    def run(self):
+        """
+        function that runs in the control thread until r.is_terminated
+        :return:
+        """
+        r = self._r
+        back = self._states.back
+        back[3:6] = self._theta
+        self._states.publish(0, time.perf_counter())
+
+        next_step = time.perf_counter()
+        last = None
+        while not r.is_terminated:
+            now = time.perf_counter()
+            if now < next_step:
+                time.sleep(next_step - now)
+                continue
+            if now - next_step > self._period:
+                # more than one period late: do not try to catch up, restart the schedule from now
+                self._late_steps += 1
+                next_step = now
+            next_step += self._period
+
+            if r.is_paused:
+                last = None
+                continue
+
+            # measured time step, limited so that a long stall does not make the arm jump
+            dt = self._period if last is None else min(now - last, 5 * self._period)
+            last = now
+
+            back = self._states.back
+            back[0:3] = self._theta
+            self.step(dt * 1000)
+            self._steps += 1
+
+            back[3:6] = self._theta
+            back[6] = dt
+            self._states.publish(self._steps, now)
+
+        print('Control thread terminated. Steps: ' + str(self._steps) + ', late: ' + str(self._late_steps))
+
+    def render_angles(self, now=None, out=None):
+        """
+        link angles to draw at time now, interpolated between the last two control steps.
+        The rendered arm lags the control by at most one step, and moves smoothly whatever the render rate
+        :param now: time of the frame (time.perf_counter). Defaults to now
+        :param out: optional array (3,) where the result is written
+        :return: angles [deg]
+        """
+        if now is None:
+            now = time.perf_counter()
+        state, _, t_step = self._states.read(self._render_state)
+        dt = state[6]
+        alpha = 1.0 if dt <= 0 else min(max((now - t_step) / dt, 0.0), 1.0)
+        return interpolate_angles(state[0:3], state[3:6], alpha, out=out)
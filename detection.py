@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+
+# what is mapped into the cursor when the pose was not detected in the latest frame
+HOLD = 'hold'                # last valid body vector (the arm keeps the velocity of the last pose)
+EXTRAPOLATE = 'extrapolate'  # last valid vector moved at constant velocity, for at most max_extrapolation
+FREEZE = 'freeze'            # nothing: the arm stops until the pose is detected again
+POLICIES = (HOLD, EXTRAPOLATE, FREEZE)
+
+
+class MissingDetectionPolicy:
+    """
+    Class that chooses the body vector given to the BoMI map when the pose estimation lost the hand.
+    The body buffer holds the last valid vector in the frames where nothing was detected; depending on the policy the
+    held vector is used as it is, extrapolated at the velocity of the last two valid vectors (then frozen after
+    max_extrapolation ms), or not used at all
+    """
+
+    def __init__(self, size, policy=HOLD, max_extrapolation=100):
+        """
+        :param size: length of the body vector
+        :param policy: HOLD, EXTRAPOLATE or FREEZE
+        :param max_extrapolation: longest extrapolation before freezing [ms]
+        """
+        if policy not in POLICIES:
+            raise ValueError("unknown missing detection policy " + str(policy))
+        self._policy = policy
+        self._max_extrapolation = max_extrapolation / 1000
+        self._last = np.zeros((size,))
+        self._prev = np.zeros((size,))
+        self._t_last = 0.0
+        self._t_prev = 0.0
+        self._seen = None
+        self._velocity = np.zeros((size,))
+        self._out = np.zeros((size,))
+        self._age = 0.0
+        self._missed = 0
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @property
+    def age(self):
+        """time since the capture of the last frame where the pose was detected [ms] (at the last update)"""
+        return self._age * 1000
+
+    @property
+    def missed(self):
+        """number of updates without detection"""
+        return self._missed
+
+    def update(self, body, detected, t_valid, now=None):
+        """
+        :param body: body vector read from the body buffer (the last valid one if detected is False)
+        :param detected: whether the pose was detected in the latest frame
+        :param t_valid: capture time of the last frame where the pose was detected (0 if never)
+        :param now: current time (time.perf_counter). Defaults to now
+        :return: body vector to map, or None if the cursor has to be frozen
+        """
+        if now is None:
+            now = time.perf_counter()
+        if t_valid != self._t_last:
+            # new valid sample: keep the last two to estimate the velocity
+            self._prev, self._last = self._last, self._prev
+            np.copyto(self._last, body)
+            self._t_prev, self._t_last = self._t_last, t_valid
+            dt = self._t_last - self._t_prev
+            if self._t_prev > 0 and dt > 0:
+                np.subtract(self._last, self._prev, out=self._velocity)
+                self._velocity /= dt
+            else:
+                self._velocity[:] = 0
+        self._age = now - t_valid if t_valid > 0 else 0.0
+
+        if detected:
+            self._seen = now
+            return body
+        self._missed += 1
+        if self._policy == HOLD:
+            return body
+        if self._policy == FREEZE or self._seen is None:
+            return None
+
+        # extrapolate from the last time a detection was used, so the vector does not jump when the hand is lost
+        elapsed = now - self._seen
+        if elapsed > self._max_extrapolation:
+            return None
+        np.multiply(self._velocity, elapsed, out=self._out)
+        self._out += self._last
+        return self._out
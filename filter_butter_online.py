@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import signal
 
 
 class FilterButter3:
@@ -11,13 +12,13 @@ class FilterButter3:
 
         # Array of input values, latest are in front
         # self._input_history = np.zeros([3, 8], 'float')
-        self._in_cursor_history = np.zeros([3, 2], 'float')
+        self._in_cursor_history = np.zeros([3, 3], 'float')
 
         # Array of output values, latest are in front
         # self._output_history = np.zeros([3, 8], 'float')
-        self._out_cursor_history = np.zeros([3, 2], 'float')
+        self._out_cursor_history = np.zeros([3, 3], 'float')
 
-        # Coefficients for cursor (50 Hz) 4Hz - 3Hz - 2Hz - 1Hz
+        # Coefficients for cursor (50 Hz) 4Hz - 3Hz - 2Hz - 1Hz (the values in use are the 2 Hz ones)
         if self._pass_type == "lowpass_4":
             self._a1 = -2.498608344691178  # -2.003797477370017; -2.250085081726394; -2.498608344691178
             self._a2 = 2.115254127003159  # 1.447054019489380; 1.756401381785953; 2.115254127003159
@@ -58,3 +59,90 @@ class FilterButter3:
     @property
     def filtered_value(self):
         return self._out_cursor_history[0, :]
+
+
+class FilterButterworth:
+    """
+        Class to perform online filter of an N-channel vector (cursor, link angles, body landmarks)
+        with a Butterworth filter of any order, stored as second-order sections
+    """
+
+    def __init__(self, order, cutoff, fs, n_channels, btype='lowpass'):
+        """
+        :param order: order of the filter
+        :param cutoff: cutoff frequency [Hz] (pair of frequencies for bandpass/bandstop)
+        :param fs: sample rate [Hz]
+        :param n_channels: number of values filtered at each update
+        :param btype: 'lowpass', 'highpass', 'bandpass' or 'bandstop'
+        """
+        self._sos = signal.butter(order, cutoff, btype=btype, fs=fs, output='sos')
+        self._n_channels = n_channels
+
+        # state and output of each section (transposed direct form II), one column per channel
+        self._state = np.zeros((self._sos.shape[0], 2, n_channels))
+        self._sections_out = np.zeros((self._sos.shape[0], n_channels))
+        self._output = self._sections_out[-1]
+        self._tmp = np.zeros((n_channels,))
+
+    @property
+    def sos(self):
+        return self._sos
+
+    @property
+    def n_channels(self):
+        return self._n_channels
+
+    @property
+    def filtered_value(self):
+        return self._output
+
+    def reset(self, x0=None):
+        """
+        clear the state of the filter
+        :param x0: optional first input. If given, the state is set as if x0 had been applied forever (no transient)
+        :return:
+        """
+        if x0 is None:
+            self._state[:] = 0
+        else:
+            self._state[:] = signal.sosfilt_zi(self._sos)[:, :, None] * np.asarray(x0, dtype=float)
+        self._sections_out[:] = 0
+
+    def update(self, new_input):
+        """
+        filter one sample of every channel
+        :param new_input: array (n_channels,)
+        :return: filtered values (n_channels,). The array is reused at the next call
+        """
+        x = np.asarray(new_input, dtype=float)
+        for (b0, b1, b2, a0, a1, a2), z, y in zip(self._sos, self._state, self._sections_out):
+            # y = b0 * x + z0; z0 = b1 * x - a1 * y + z1; z1 = b2 * x - a2 * y
+            np.multiply(x, b0, out=y)
+            y += z[0]
+            np.multiply(x, b1, out=z[0])
+            np.multiply(y, a1, out=self._tmp)
+            z[0] -= self._tmp
+            z[0] += z[1]
+            np.multiply(x, b2, out=z[1])
+            np.multiply(y, a2, out=self._tmp)
+            z[1] -= self._tmp
+            # the output of this section is the input of the next one
+            x = y
+        return self._output
+
+    def apply(self, x, axis=0, steady=False):
+        """
+        filter whole arrays offline with the same filter (causal, as online)
+        :param x: array with the samples along axis (e.g. N x 42 calibration landmarks)
+        :param axis: axis of the samples
+        :param steady: start from the steady state of the first sample instead of zero
+        :return: filtered array
+        """
+        x = np.asarray(x, dtype=float)
+        if not steady:
+            return signal.sosfilt(self._sos, x, axis=axis)
+        x0 = np.take(x, [0], axis=axis)
+        zi_shape = [1] * x.ndim
+        zi_shape[axis] = 2
+        zi = signal.sosfilt_zi(self._sos).reshape((self._sos.shape[0],) + tuple(zi_shape)) * x0
+        return signal.sosfilt(self._sos, x, axis=axis, zi=zi)[0]
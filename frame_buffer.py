@@ -0,0 +1,147 @@
+import time
+from collections import deque
+from threading import Condition
+
+
+class FrameBuffer:
+    """
+    Class that hands webcam frames from the capture thread to the pose estimation thread.
+    It keeps at most `capacity` frames ready to be consumed and drops the oldest one when the consumer is slower
+    than the camera. Frame storage is allocated once and then reused: the producer reads directly into a free slot
+    and the consumer keeps the slot it is working on until it asks for the next frame.
+    """
+
+    def __init__(self, capacity=1):
+        if capacity < 1:
+            raise ValueError("FrameBuffer capacity must be at least 1")
+        self._capacity = capacity
+
+        # capacity ready slots + 1 slot being written by the producer + 1 slot held by the consumer
+        n_slots = capacity + 2
+        self._slots = [None] * n_slots
+        self._frame_id = [0] * n_slots
+        self._timestamp = [0.0] * n_slots
+        self._free = list(range(n_slots))
+        self._ready = deque()
+        self._writing = None
+        self._held = None
+
+        self._cond = Condition()
+        self._closed = False
+
+        # counters
+        self._captured = 0
+        self._dropped = 0
+        self._consumed = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def captured(self):
+        return self._captured
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    @property
+    def consumed(self):
+        return self._consumed
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def frame_id(self):
+        """id of the frame currently held by the consumer (0 if none)"""
+        if self._held is None:
+            return 0
+        return self._frame_id[self._held]
+
+    @property
+    def timestamp(self):
+        """capture time (time.perf_counter, seconds) of the frame currently held by the consumer"""
+        if self._held is None:
+            return 0.0
+        return self._timestamp[self._held]
+
+    def acquire(self):
+        """
+        reserve a slot for the producer. If every slot is taken, the oldest ready frame is dropped
+        :return: preallocated frame to read into (None until the first frame has been committed in that slot)
+        """
+        with self._cond:
+            if self._writing is None:
+                if not self._free:
+                    self._free.append(self._ready.popleft())
+                    self._dropped += 1
+                self._writing = self._free.pop()
+            return self._slots[self._writing]
+
+    def commit(self, frame, timestamp=None):
+        """
+        publish the frame written in the slot reserved by acquire()
+        :param frame: frame returned by the reader. It replaces the slot storage if the reader had to reallocate it
+        :param timestamp: capture time (time.perf_counter). Defaults to now
+        :return: id assigned to the frame
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        with self._cond:
+            if self._writing is None:
+                raise RuntimeError("FrameBuffer.commit() called without acquire()")
+            idx = self._writing
+            self._writing = None
+            self._slots[idx] = frame
+            self._captured += 1
+            self._frame_id[idx] = self._captured
+            self._timestamp[idx] = timestamp
+            self._ready.append(idx)
+            if len(self._ready) > self._capacity:
+                self._free.append(self._ready.popleft())
+                self._dropped += 1
+            self._cond.notify()
+            return self._captured
+
+    def cancel(self):
+        """
+        give back the slot reserved by acquire() without publishing it (e.g. when the camera read failed)
+        :return:
+        """
+        with self._cond:
+            if self._writing is not None:
+                self._free.append(self._writing)
+                self._writing = None
+
+    def get(self, timeout=None):
+        """
+        return the oldest ready frame. The previously returned frame is released and must not be used anymore
+        :param timeout: maximum time to wait for a frame [s]. None waits until a frame arrives or the buffer is closed
+        :return: frame, or None on timeout / when the buffer has been closed
+        """
+        with self._cond:
+            if not self._ready and not self._closed:
+                self._cond.wait(timeout)
+            if not self._ready:
+                return None
+            if self._held is not None:
+                self._free.append(self._held)
+            self._held = self._ready.popleft()
+            self._consumed += 1
+            return self._slots[self._held]
+
+    def close(self):
+        """
+        wake up any consumer waiting in get()
+        :return:
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return "captured: " + str(self._captured) + ", consumed: " + str(self._consumed) + \
+               ", dropped: " + str(self._dropped)
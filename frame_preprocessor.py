@@ -0,0 +1,92 @@
+import numpy as np
+
+from lazy_modules import LazyModule
+
+cv2 = LazyModule('cv2')
+
+# handedness reported by MediaPipe on the mirrored image, for the label found on the camera image
+MIRRORED_HANDEDNESS = {'Left': 'Right', 'Right': 'Left'}
+
+
+class FramePreprocessor:
+    """
+    Class that prepares the webcam frames for MediaPipe without allocating a new image at every frame.
+    BGR to RGB conversion (and the optional downsampling) write into destination buffers that are allocated once
+    for each input size and then reused. The frame is not flipped: MediaPipe runs on the camera image and the
+    landmarks are mirrored afterwards (x -> 1 - x, left <-> right), which gives the same selfie-view coordinates
+    the BoMI map was trained with.
+    allocations counts the buffers created: after the first frames it stays constant
+    """
+
+    def __init__(self, max_buffers=16):
+        """
+        :param max_buffers: number of buffers of different sizes kept (crops of HandRoiTracker have few sizes)
+        """
+        self._max_buffers = max_buffers
+        self._rgb = {}
+        self._resized = {}
+        self._frames = 0
+        self._allocations = 0
+        self._frame_allocations = 0
+
+    @property
+    def frames(self):
+        """number of images converted"""
+        return self._frames
+
+    @property
+    def allocations(self):
+        """number of buffers allocated since the beginning"""
+        return self._allocations
+
+    @property
+    def frame_allocations(self):
+        """number of buffers allocated while preparing the last frame (0 in steady state)"""
+        return self._frame_allocations
+
+    def _buffer(self, buffers, shape, dtype):
+        buf = buffers.get(shape)
+        if buf is None:
+            if len(buffers) >= self._max_buffers:
+                buffers.clear()
+            buf = np.empty(shape, dtype=dtype)
+            buffers[shape] = buf
+            self._allocations += 1
+            self._frame_allocations += 1
+        return buf
+
+    def convert(self, frame, size=None):
+        """
+        :param frame: BGR frame, or a view of a region of it
+        :param size: optional (width, height) the image is resized to before the conversion
+        :return: RGB image, valid until the next call with an image of the same size
+        """
+        self._frames += 1
+        self._frame_allocations = 0
+        if size is not None and (size[0] != frame.shape[1] or size[1] != frame.shape[0]):
+            resized = self._buffer(self._resized, (size[1], size[0], frame.shape[2]), frame.dtype)
+            frame = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+        rgb = self._buffer(self._rgb, frame.shape, frame.dtype)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+
+    @staticmethod
+    def mirror(results):
+        """
+        mirror in place the hand landmarks and the handedness estimated on the camera image, as if the image had
+        been flipped horizontally before inference (pose landmarks would also need left/right indices swapped)
+        :param results: output of hands.process()
+        :return:
+        """
+        hand_landmarks = getattr(results, 'multi_hand_landmarks', None)
+        if hand_landmarks:
+            for hand in hand_landmarks:
+                for lm in hand.landmark:
+                    lm.x = 1.0 - lm.x
+        handedness = getattr(results, 'multi_handedness', None)
+        if handedness:
+            for hand in handedness:
+                for classification in hand.classification:
+                    classification.label = MIRRORED_HANDEDNESS.get(classification.label, classification.label)
+
+    def stats(self):
+        return "frames: " + str(self._frames) + ", buffers allocated: " + str(self._allocations)
@@ -0,0 +1,384 @@
+import argparse
+import os
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from lazy_modules import LazyModule
+
+cv2 = LazyModule('cv2')
+
+# index of the webcam
+CAMERA_INDEX = 1
+# source of the frames of calibration, customization and practice: webcam index, 'synthetic', image directory or
+# video file (see open_frame_source)
+FRAME_SOURCE = CAMERA_INDEX
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+class FrameSource(ABC):
+    """
+    Base class of the sources of BGR frames consumed by the capture thread. The interface is the subset of
+    cv2.VideoCapture used by the pipeline: read(frame) -> (ret, frame) and release(), so any source can replace
+    the webcam. exhausted becomes True when a finite source (video file, image sequence) has no more frames
+    """
+
+    def __init__(self, fps=0.0):
+        """
+        :param fps: rate at which frames are returned. 0 returns them as fast as possible
+        """
+        self._fps = fps
+        self._next = None
+        self._frames_read = 0
+        self._exhausted = False
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @property
+    @abstractmethod
+    def resolution(self):
+        """(width, height) of the frames [px]"""
+
+    @property
+    def frames_read(self):
+        return self._frames_read
+
+    @property
+    def exhausted(self):
+        return self._exhausted
+
+    def _wait(self):
+        """
+        sleep until the next frame is due, so that a recorded source is played back at its own rate
+        :return:
+        """
+        if self._fps <= 0:
+            return
+        now = time.perf_counter()
+        if self._next is None or now - self._next > 1.0 / self._fps:
+            # first frame, or the consumer fell behind by more than a frame: restart the schedule from now
+            self._next = now
+        elif now < self._next:
+            time.sleep(self._next - now)
+        self._next += 1.0 / self._fps
+
+    @abstractmethod
+    def _grab(self, frame):
+        """
+        get the next frame from the source, without waiting
+        :param frame: optional preallocated frame to write into
+        :return: True if a frame was read, frame
+        """
+
+    def read(self, frame=None):
+        """
+        get the next frame
+        :param frame: optional preallocated frame to write into (as in cv2.VideoCapture.read)
+        :return: True if a frame was read, frame
+        """
+        if self._exhausted:
+            return False, frame
+        self._wait()
+        ret, frame = self._grab(frame)
+        if ret:
+            self._frames_read += 1
+        return ret, frame
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class DeviceSource(FrameSource):
+    """
+    Live webcam. Resolution, rate and pixel format are requested to the driver when the device is opened
+    (e.g. fourcc='MJPG' lets most USB webcams reach 30/60 fps at resolutions where raw YUYV is limited by the bus).
+    The driver may ignore a request: the values actually in use are read back and exposed as properties
+    """
+
+    def __init__(self, index=CAMERA_INDEX, width=None, height=None, fps=None, fourcc=None, buffer_size=None):
+        """
+        :param index: index of the webcam
+        :param width: requested width of the frames [px]. None keeps the default of the driver
+        :param height: requested height of the frames [px]
+        :param fps: requested frame rate [Hz]
+        :param fourcc: requested pixel format (four characters, e.g. 'MJPG' or 'YUYV')
+        :param buffer_size: number of frames queued by the driver (1 gives the most recent frame at each read)
+        """
+        super().__init__()
+        self._index = index
+        self._cap = cv2.VideoCapture(index)
+        # the pixel format has to be set before the resolution, otherwise some drivers reset it
+        if fourcc is not None:
+            self._cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width is not None:
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height is not None:
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            self._cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size is not None:
+            self._cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def is_opened(self):
+        return self._cap.isOpened()
+
+    @property
+    def fps(self):
+        """rate reported by the driver (the camera paces the reads, so no extra wait is added)"""
+        return self._cap.get(cv2.CAP_PROP_FPS)
+
+    @property
+    def resolution(self):
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    @property
+    def fourcc(self):
+        code = int(self._cap.get(cv2.CAP_PROP_FOURCC))
+        return "".join(chr((code >> 8 * k) & 0xFF) for k in range(4))
+
+    def _grab(self, frame):
+        return self._cap.read(frame)
+
+    def release(self):
+        self._cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Recorded video file, played back at its native rate (as if it came from the webcam) or as fast as possible
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        """
+        :param path: video file
+        :param realtime: wait between frames to respect the rate of the recording. False: maximum speed
+        :param loop: start again from the first frame at the end of the file
+        """
+        self._path = path
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise IOError("cannot open video file " + str(path))
+        native_fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        super().__init__(native_fps if realtime else 0.0)
+        self._native_fps = native_fps
+        self._loop = loop
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def native_fps(self):
+        return self._native_fps
+
+    @property
+    def frame_count(self):
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    @property
+    def resolution(self):
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def _grab(self, frame):
+        ret, frame = self._cap.read(frame)
+        if not ret and self._loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read(frame)
+        if not ret:
+            self._exhausted = True
+        return ret, frame
+
+    def release(self):
+        self._cap.release()
+
+
+class ImageSequenceSource(FrameSource):
+    """
+    Directory of images (sorted by path, subdirectories included), one frame per image
+    """
+
+    def __init__(self, directory, fps=30.0, loop=False):
+        """
+        :param directory: directory with the images
+        :param fps: playback rate [Hz]. 0: maximum speed
+        :param loop: start again from the first image after the last one
+        """
+        super().__init__(fps)
+        self._files = sorted(os.path.join(root, f) for root, _, files in os.walk(directory) for f in files
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not self._files:
+            raise IOError("no images found in " + str(directory))
+        self._directory = directory
+        self._loop = loop
+        self._pos = 0
+        self._resolution = None
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def frame_count(self):
+        return len(self._files)
+
+    @property
+    def resolution(self):
+        if self._resolution is None:
+            image = cv2.imread(self._files[0])
+            self._resolution = image.shape[1], image.shape[0]
+        return self._resolution
+
+    def _grab(self, frame):
+        if self._pos == len(self._files):
+            if not self._loop:
+                self._exhausted = True
+                return False, frame
+            self._pos = 0
+        image = cv2.imread(self._files[self._pos])
+        self._pos += 1
+        if image is None:
+            return False, frame
+        if frame is not None and frame.shape == image.shape:
+            np.copyto(frame, image)
+            return True, frame
+        return True, image
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames: a bright square moving on a noisy background, with the frame number encoded in the first
+    row of pixels. No camera or file is needed, so the capture, the frame buffer and the consumers can be
+    benchmarked and tested anywhere (pose estimation will not find a hand in these frames)
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, n_frames=None, seed=0):
+        """
+        :param width: width of the frames [px]
+        :param height: height of the frames [px]
+        :param fps: rate [Hz]. 0: maximum speed
+        :param n_frames: number of frames before the source is exhausted. None: endless
+        :param seed: seed of the random generator of the background
+        """
+        super().__init__(fps)
+        self._width = width
+        self._height = height
+        self._n_frames = n_frames
+        rng = np.random.default_rng(seed)
+        self._background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+        self._side = max(min(width, height) // 8, 1)
+
+    @property
+    def resolution(self):
+        return self._width, self._height
+
+    def _grab(self, frame):
+        if self._n_frames is not None and self._frames_read >= self._n_frames:
+            self._exhausted = True
+            return False, frame
+        if frame is None or frame.shape != self._background.shape:
+            frame = np.empty_like(self._background)
+        np.copyto(frame, self._background)
+
+        # square moving along a circle, one turn every 4 s at the nominal rate
+        t = self._frames_read / (self._fps if self._fps > 0 else 30.0)
+        cx = int((0.5 + 0.3 * np.cos(np.pi * t / 2)) * (self._width - self._side))
+        cy = int((0.5 + 0.3 * np.sin(np.pi * t / 2)) * (self._height - self._side))
+        frame[cy:cy + self._side, cx:cx + self._side] = 255
+
+        # frame number (little endian) in the blue channel of the first pixels
+        n = self._frames_read
+        for k in range(min(4, self._width)):
+            frame[0, k, 0] = (n >> 8 * k) & 0xFF
+        return True, frame
+
+
+def open_frame_source(source=CAMERA_INDEX, **kwargs):
+    """
+    create the frame source described by source
+    :param source: webcam index (int or digit string), 'synthetic', path of a directory of images or of a video file
+    :param kwargs: arguments of the constructor of the chosen source (e.g. width, height, fps, fourcc for a webcam)
+    :return: object of a FrameSource subclass
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return DeviceSource(int(source), **kwargs)
+    if source == 'synthetic':
+        return SyntheticSource(**kwargs)
+    if os.path.isdir(source):
+        return ImageSequenceSource(source, **kwargs)
+    if os.path.isfile(source):
+        return VideoFileSource(source, **kwargs)
+    raise ValueError("unknown frame source " + str(source))
+
+
+def measure_rate(source, n_frames=120, warmup=10):
+    """
+    read frames as fast as the source delivers them
+    :param source: object of a FrameSource subclass
+    :param n_frames: number of frames timed
+    :param warmup: frames read before timing (the first reads of a webcam are slow)
+    :return: achieved rate [Hz], 95th percentile of the interval between frames [ms]
+    """
+    frame = None
+    for _ in range(warmup):
+        _, frame = source.read(frame)
+    times = np.zeros((n_frames + 1,))
+    times[0] = time.perf_counter()
+    read = 0
+    for k in range(1, n_frames + 1):
+        ret, frame = source.read(frame)
+        if not ret:
+            break
+        times[k] = time.perf_counter()
+        read = k
+    if read == 0:
+        return 0.0, np.nan
+    dt = np.diff(times[:read + 1])
+    return read / (times[read] - times[0]), np.percentile(dt, 95) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the frame rate actually delivered by a frame source. "
+                                                 "For a webcam, every combination of the given formats and "
+                                                 "resolutions is tried")
+    parser.add_argument("source", nargs="?", default=str(CAMERA_INDEX),
+                        help="webcam index, 'synthetic', image directory or video file")
+    parser.add_argument("--fourcc", nargs="*", default=["MJPG", "YUYV"], help="pixel formats to try (webcam)")
+    parser.add_argument("--resolution", nargs="*", default=["640x480", "1280x720", "1920x1080"],
+                        help="resolutions to try (webcam)")
+    parser.add_argument("--fps", type=float, default=60, help="requested rate (webcam)")
+    parser.add_argument("--frames", type=int, default=120, help="number of frames timed")
+    args = parser.parse_args()
+
+    if args.source.isdigit():
+        print("fourcc\trequested\tactual\tdriver_fps\tfps\tdt_p95_ms")
+        for fourcc in args.fourcc:
+            for resolution in args.resolution:
+                width, height = (int(v) for v in resolution.split("x"))
+                with DeviceSource(int(args.source), width, height, args.fps, fourcc, buffer_size=1) as src:
+                    if not src.is_opened:
+                        raise IOError("cannot open webcam " + args.source)
+                    fps, dt_p95 = measure_rate(src, args.frames)
+                    actual = "x".join(str(v) for v in src.resolution)
+                    print(src.fourcc + "\t" + resolution + "\t" + actual + "\t" + "{:.1f}".format(src.fps) + "\t" +
+                          "{:.1f}".format(fps) + "\t" + "{:.2f}".format(dt_p95))
+    else:
+        with open_frame_source(args.source) as src:
+            fps, dt_p95 = measure_rate(src, args.frames)
+            print("source\tresolution\tfps\tdt_p95_ms")
+            print(args.source + "\t" + "x".join(str(v) for v in src.resolution) + "\t" + "{:.1f}".format(fps) +
+                  "\t" + "{:.2f}".format(dt_p95))
@@ -0,0 +1,110 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# modules timed one by one, each in a fresh interpreter
+MODULES = ("numpy", "cv2", "tkinter", "pandas", "scipy.signal", "matplotlib.pyplot", "pygame", "pyautogui",
+           "mediapipe", "tensorflow", "compute_bomi_map", "keras_autoencoder", "main_reaching")
+
+# child process that opens the main window and prints the time it was drawn. With eager, the heavy modules are
+# imported before the window, as main_reaching did before they were loaded lazily
+FIRST_WINDOW = """
+import sys, time
+import main_reaching
+if {eager}:
+    for module in main_reaching.PRELOAD_MODULES:
+        try:
+            module.load()
+        except ImportError as e:
+            print('missing ' + module.name + ': ' + str(e), file=sys.stderr)
+    try:
+        import keras_autoencoder
+    except ImportError as e:
+        print('missing keras_autoencoder: ' + str(e), file=sys.stderr)
+t_import = time.time()
+try:
+    tk_window = main_reaching.tk.Tk()
+except main_reaching.tk.TclError as e:
+    print('no display: ' + str(e), file=sys.stderr)
+    print(t_import, 'nan')
+    sys.exit(0)
+tk_window.geometry("1366x768")
+main_reaching.MainApplication(tk_window).pack(side="top", fill="both", expand=True)
+tk_window.update()
+print(t_import, time.time())
+tk_window.destroy()
+"""
+
+
+def _run(code):
+    """
+    :return: time at which the child was started (time.time()), stdout, stderr, return code
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    t0 = time.time()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True)
+    return t0, proc.stdout, proc.stderr, proc.returncode
+
+
+def time_import(module):
+    """
+    import a module in a fresh interpreter
+    :param module: name of the module
+    :return: import time [s] (nan if the module cannot be imported), error message
+    """
+    code = "import time; t0 = time.perf_counter(); import " + module + "; print(time.perf_counter() - t0)"
+    _, out, err, code = _run(code)
+    if code != 0:
+        lines = err.strip().splitlines()
+        return np.nan, lines[-1] if lines else "exit code " + str(code)
+    return float(out.strip().splitlines()[-1]), ""
+
+
+def time_first_window(eager=False):
+    """
+    start the GUI in a fresh interpreter
+    :param eager: import the heavy modules before the window (previous startup)
+    :return: time from the start of the process to the end of the imports and to the window drawn [s] (nan if the
+    window cannot be opened), error message
+    """
+    t0, out, err, code = _run(FIRST_WINDOW.format(eager=eager))
+    if code != 0:
+        lines = err.strip().splitlines()
+        return np.nan, np.nan, lines[-1] if lines else "exit code " + str(code)
+    t_import, t_window = (float(v) for v in out.strip().splitlines()[-1].split())
+    return t_import - t0, t_window - t0, err.strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the heavy dependencies and the time "
+                                                 "to the first window of the GUI, with lazy and eager imports")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each measure (the median is printed)")
+    parser.add_argument("--modules", nargs="*", default=list(MODULES), help="modules to time")
+    args = parser.parse_args()
+
+    print("module\timport_ms")
+    for module in args.modules:
+        times = []
+        error = ""
+        for _ in range(args.repeat):
+            t, error = time_import(module)
+            times.append(t)
+        print(module + "\t" + ("{:.0f}".format(np.median(times) * 1000) if not error else "n/a (" + error + ")"))
+
+    print("\nstartup\timports_ms\tfirst_window_ms")
+    for eager in (False, True):
+        imports = []
+        windows = []
+        message = ""
+        for _ in range(args.repeat):
+            t_import, t_window, message = time_first_window(eager)
+            imports.append(t_import)
+            windows.append(t_window)
+        print(("eager" if eager else "lazy") + "\t" + "{:.0f}".format(np.median(imports) * 1000) + "\t" +
+              "{:.0f}".format(np.median(windows) * 1000))
+        if message:
+            print("  " + message.splitlines()[-1])
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def wrap_angles(theta, out=None):
+    """
+    wrap link angles into [0, 360) degrees
+    :param theta: angles [deg], scalar or array
+    :param out: optional array where the result is written
+    :return: wrapped angles
+    """
+    return np.mod(theta, 360, out=out)
+
+
+def arm_base(width, height):
+    """
+    screen position of the first joint of the arm (bottom center of the workspace)
+    :param width: width of the window [px]
+    :param height: height of the window [px]
+    :return: (x, y) of the base [px]
+    """
+    return width / 2, height * 0.85
+
+
+def forward_kinematics(theta, link_length, base, out=None):
+    """
+    positions of the joints and of the end effector of a planar N-link arm on screen (y axis pointing down).
+    Each angle is absolute (measured from the horizontal axis), as in the practice and customization GUIs
+    :param theta: link angles [deg], array (n_links,) for one sample or (N, n_links) for N samples
+    :param link_length: length of the links [px], scalar or array (n_links,)
+    :param base: (x, y) of the first joint [px]
+    :param out: optional preallocated array with the shape of the result
+    :return: array (n_links + 1, 2) or (N, n_links + 1, 2) with base, joint 2, ..., joint n_links, end effector
+    """
+    theta = np.asarray(theta, dtype=float)
+    if out is None:
+        out = np.empty(theta.shape[:-1] + (theta.shape[-1] + 1, 2))
+
+    rad = np.radians(theta)
+    out[..., 0, 0] = base[0]
+    out[..., 0, 1] = base[1]
+    np.cumsum(np.cos(rad) * link_length, axis=-1, out=out[..., 1:, 0])
+    np.cumsum(np.sin(rad) * -link_length, axis=-1, out=out[..., 1:, 1])
+    out[..., 1:, 0] += base[0]
+    out[..., 1:, 1] += base[1]
+    return out
+
+
+def end_effector(theta, link_length, base):
+    """
+    screen position of the end effector (cursor) of a planar N-link arm
+    :param theta: link angles [deg], array (n_links,) or (N, n_links)
+    :param link_length: length of the links [px], scalar or array (n_links,)
+    :param base: (x, y) of the first joint [px]
+    :return: array (2,) or (N, 2)
+    """
+    return forward_kinematics(theta, link_length, base)[..., -1, :]
@@ -0,0 +1,111 @@
+import numpy as np
+
+# MediaPipe landmark indices (mp.solutions.pose.PoseLandmark / mp.solutions.hands.HandLandmark)
+POSE_LANDMARKS = {'nose': 0, 'left_eye': 2, 'right_eye': 5, 'left_shoulder': 11, 'right_shoulder': 12}
+HAND_LANDMARKS = ['wrist', 'thumb_cmc', 'thumb_mcp', 'thumb_ip', 'thumb_tip',
+                  'index_finger_mcp', 'index_finger_pip', 'index_finger_dip', 'index_finger_tip',
+                  'middle_finger_mcp', 'middle_finger_pip', 'middle_finger_dip', 'middle_finger_tip',
+                  'ring_finger_mcp', 'ring_finger_pip', 'ring_finger_dip', 'ring_finger_tip',
+                  'pinky_mcp', 'pinky_pip', 'pinky_dip', 'pinky_tip']
+
+# one row per row of MainApplication.joints: (source of the landmarks, landmark names)
+JOINT_TABLE = [('pose', ['nose']),
+               ('pose', ['right_eye', 'left_eye']),
+               ('pose', ['right_shoulder', 'left_shoulder']),
+               ('hand', ['index_finger_tip']),
+               ('hand', HAND_LANDMARKS)]
+
+
+class LandmarkExtractor:
+    """
+    Class that copies the x/y coordinates of the selected MediaPipe landmarks into a preallocated body vector.
+    The landmarks to read are resolved once from JOINT_TABLE, so the per-frame work is a single pass over the
+    selected indices with no temporary lists or arrays
+    """
+
+    def __init__(self, joints):
+        """
+        :param joints: array (5, 1) with the joints selected in the main window (nose, eyes, shoulders, forefinger,
+        fingers)
+        """
+        pose_idx = []
+        hand_idx = []
+        names = []
+        for row, (source, joint_names) in enumerate(JOINT_TABLE):
+            if joints[row, 0] != 1:
+                continue
+            for name in joint_names:
+                if source == 'pose':
+                    pose_idx.append(POSE_LANDMARKS[name])
+                else:
+                    hand_idx.append(HAND_LANDMARKS.index(name))
+                names.append(name + '_x')
+                names.append(name + '_y')
+
+        self._pose_idx = tuple(pose_idx)
+        self._hand_idx = tuple(hand_idx)
+        self._names = names
+
+    @property
+    def size(self):
+        return len(self._names)
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def needs_pose(self):
+        return len(self._pose_idx) > 0
+
+    @property
+    def needs_hand(self):
+        return len(self._hand_idx) > 0
+
+    def empty(self, dtype=np.float32):
+        """
+        :return: preallocated body vector of the right size
+        """
+        return np.zeros((self.size,), dtype=dtype)
+
+    def extract(self, results, out):
+        """
+        fill out with the selected landmarks found in the MediaPipe results
+        :param results: output of hands.process() / holistic.process()
+        :param out: preallocated body vector (see empty()). It is left untouched if a landmark group is missing
+        :return: True if every selected landmark was available, False otherwise
+        """
+        pose_landmarks = getattr(results, 'pose_landmarks', None)
+        hand_landmarks = getattr(results, 'multi_hand_landmarks', None)
+        if self._pose_idx and not pose_landmarks:
+            return False
+        if self._hand_idx and not hand_landmarks:
+            return False
+
+        k = 0
+        if self._pose_idx:
+            landmark = pose_landmarks.landmark
+            for i in self._pose_idx:
+                lm = landmark[i]
+                out[k] = lm.x
+                out[k + 1] = lm.y
+                k += 2
+        if self._hand_idx:
+            landmark = hand_landmarks[0].landmark
+            for i in self._hand_idx:
+                lm = landmark[i]
+                out[k] = lm.x
+                out[k + 1] = lm.y
+                k += 2
+        return True
+
+
+def detection_score(results):
+    """
+    :param results: output of hands.process() / holistic.process()
+    :return: confidence of the detected hand (handedness score), 1 if MediaPipe does not report one
+    """
+    handedness = getattr(results, 'multi_handedness', None)
+    if handedness:
+        return handedness[0].classification[0].score
+    return 1.0
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+
+# stages of the pipeline, in the order a frame goes through them
+CAPTURE = 0     # frame committed by the camera thread
+POSE_START = 1  # frame taken by the mediapipe thread
+POSE = 2        # landmarks extracted (before publishing the body vector)
+MAP = 3         # BoMI map applied in the control loop
+RENDER = 4      # display updated with the cursor computed from the frame
+STAGES = ('capture', 'pose_start', 'pose', 'map', 'render')
+
+# intervals reported by the monitor: (name, first stage, last stage)
+INTERVALS = (('queue', CAPTURE, POSE_START),
+             ('inference', POSE_START, POSE),
+             ('handover', POSE, MAP),
+             ('render', MAP, RENDER),
+             ('end_to_end', CAPTURE, RENDER))
+
+
+class LatencyMonitor:
+    """
+    Class that records when each frame goes through the stages of the pipeline (time.perf_counter, seconds).
+    Timestamps are written into a preallocated ring buffer indexed by frame id, so marking a stage is a couple of
+    array writes and nothing is allocated while running. Only the first time a frame reaches a stage is kept
+    (a pose is mapped and rendered at several ticks if the camera is slower than the control loop).
+    When disabled, mark() returns immediately
+    """
+
+    def __init__(self, capacity=2048, enabled=True):
+        """
+        :param capacity: number of frames kept (rolling window of the statistics)
+        :param enabled: record timestamps from the beginning
+        """
+        self._times = np.full((capacity, len(STAGES)), np.nan)
+        self._frame_id = np.full((capacity,), -1, dtype=np.int64)
+        self._enabled = enabled
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+
+    @property
+    def capacity(self):
+        return self._frame_id.shape[0]
+
+    def toggle(self):
+        self._enabled = not self._enabled
+        return self._enabled
+
+    def mark(self, stage, frame_id, t=None):
+        """
+        record that a frame reached a stage
+        :param stage: one of CAPTURE, POSE_START, POSE, MAP, RENDER
+        :param frame_id: id of the frame (FrameBuffer.frame_id). Frames with id <= 0 are ignored
+        :param t: time of the event (time.perf_counter). Defaults to now
+        :return:
+        """
+        if not self._enabled or frame_id <= 0:
+            return
+        slot = frame_id % self._frame_id.shape[0]
+        row = self._times[slot]
+        if self._frame_id[slot] != frame_id:
+            # the slot held an older frame: start a new row
+            row[:] = np.nan
+            self._frame_id[slot] = frame_id
+        if row[stage] != row[stage]:  # first time this frame reaches the stage (nan != nan)
+            row[stage] = time.perf_counter() if t is None else t
+
+    def clear(self):
+        self._times[:] = np.nan
+        self._frame_id[:] = -1
+
+    def intervals(self):
+        """
+        :return: dict with the duration [ms] of each interval of INTERVALS for the frames in the window
+        """
+        out = {}
+        for name, first, last in INTERVALS:
+            dt = (self._times[:, last] - self._times[:, first]) * 1000
+            out[name] = dt[~np.isnan(dt)]
+        return out
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """
+        :param percentiles: percentiles to compute
+        :return: dict interval name -> (number of frames, values of the percentiles [ms])
+        """
+        out = {}
+        for name, dt in self.intervals().items():
+            if dt.size:
+                out[name] = (dt.size, np.percentile(dt, percentiles))
+            else:
+                out[name] = (0, np.full((len(percentiles),), np.nan))
+        return out
+
+    def format_report(self, percentiles=(50, 95, 99)):
+        """
+        :return: table (text) with the percentiles of each interval
+        """
+        lines = ["interval\tframes\t" + "\t".join("p" + str(p) + "_ms" for p in percentiles)]
+        for name, (count, values) in self.summary(percentiles).items():
+            lines.append(name + "\t" + str(count) + "\t" + "\t".join("{:.2f}".format(v) for v in values))
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path, percentiles=(50, 95, 99)):
+        """
+        save the latency report of the session
+        :param path: output text file (e.g. next to the ResultsLogDay file)
+        :return:
+        """
+        with open(path, "w") as f:
+            f.write(self.format_report(percentiles))
@@ -0,0 +1,83 @@
+import importlib
+import time
+from threading import Lock, Thread
+
+
+class LazyModule:
+    """
+    Class that stands for a module that is slow to import (mediapipe, pygame, matplotlib, ...). The module is
+    imported the first time one of its attributes is used, or earlier by preload(), so the code that uses it does not
+    change (e.g. pygame.init()) but the import cost is paid by the stage that needs it, not at startup
+    """
+
+    def __init__(self, name, setup=None):
+        """
+        :param name: name of the module (e.g. 'matplotlib.pyplot')
+        :param setup: optional function called with the module right after it is imported
+        """
+        self._name = name
+        self._setup = setup
+        self._module = None
+        self._lock = Lock()
+        self._import_time = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    @property
+    def import_time(self):
+        """time taken to import the module [s], None if not imported yet"""
+        return self._import_time
+
+    def load(self):
+        """
+        import the module (once, also when called from several threads)
+        :return: the module
+        """
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                t0 = time.perf_counter()
+                module = importlib.import_module(self._name)
+                if self._setup is not None:
+                    self._setup(module)
+                self._import_time = time.perf_counter() - t0
+                self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        # called only for attributes that are not found on the object: forward them to the module
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+
+def preload(modules, verbose=True):
+    """
+    import modules in a background thread (e.g. once the main window is shown). A module that fails to import is
+    skipped: the error is raised again by the stage that uses it
+    :param modules: sequence of LazyModule
+    :param verbose: print the import time of each module
+    :return: the thread (daemon, already started)
+    """
+    def run():
+        for module in modules:
+            try:
+                module.load()
+            except Exception as e:
+                if verbose:
+                    print('preload of ' + module.name + ' failed: ' + str(e))
+                continue
+            if verbose and module.import_time is not None:
+                print('preloaded ' + module.name + ' in ' + "{:.2f}".format(module.import_time) + ' s')
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
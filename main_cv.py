@@ -5,7 +5,9 @@ import cv2
 import numpy as np
 import cv2
 
-cap = cv2.VideoCapture(1)
+from frame_source import FRAME_SOURCE, open_frame_source
+
+cap = open_frame_source(FRAME_SOURCE)
 
 while(True):
     # Capture frame-by-frame
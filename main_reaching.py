@@ -1,35 +1,54 @@
 # General imports
 import numpy as np
-import pandas as pd
 import os
 import time
-import matplotlib.pyplot as plt
-import math
 # For multithreading
-from threading import Thread, Lock
-import queue
-# For OpenCV
-import cv2
+from threading import Event, Thread
+from frame_buffer import FrameBuffer
+from frame_source import FRAME_SOURCE, open_frame_source
+from session_recorder import SessionRecorder
+from roi_tracker import HandRoiTracker
+from frame_preprocessor import FramePreprocessor
 # For GUI
 import tkinter as tk
 from tkinter import Label, Button, BooleanVar, Checkbutton, Text, Entry, StringVar, Radiobutton, ttk
-# For pygame
-import pygame
 # For reaching task
 from reaching import Reaching
 from stopwatch import StopWatch
-from filter_butter_online import FilterButter3
+from landmarks import LandmarkExtractor, detection_score
+from body_buffer import BodyBuffer
+from calibration_recorder import CalibrationRecorder, CALIB_FILE, calibration_exists, load_calibration
+from detection import MissingDetectionPolicy, HOLD
+from pose_process import PoseProcess
+from bomi_map import BomiMap, load_bomi_map, load_transform
+from online_pca import OnlinePCA, PcaMapUpdater
+from control import ArmController
+from session_log import SessionLogWriter, SessionLogQueue, log_dtype, to_tsv
+from latency import LatencyMonitor, CAPTURE, POSE_START, POSE, MAP, RENDER
 import reaching_functions
+import kinematics
+# For training pca/autoencoder
+from compute_bomi_map import NumpyAutoencoder, PrincipalComponentAnalysis, compute_vaf
+# For the heavy dependencies: each one is imported by the first stage that uses it (or by the preload thread started
+# when the main window is shown), so the main window appears right away
+from lazy_modules import LazyModule, preload
+# For OpenCV (also lazy in frame_source, frame_preprocessor, roi_tracker and session_recorder)
+cv2 = LazyModule('cv2')
+# For plotting the latent space after training
+plt = LazyModule('matplotlib.pyplot')
+# For pygame
+pygame = LazyModule('pygame')
+rendering = LazyModule('rendering')
+# For filtering the cursor (scipy)
+filter_butter_online = LazyModule('filter_butter_online')
 # For controlling computer cursor
-import pyautogui
+# set fps of cursor to 100Hz ish when mouse_enabled is True
+pyautogui = LazyModule('pyautogui', setup=lambda module: setattr(module, 'PAUSE', 0.01))
 # For Mediapipe
-import mediapipe as mp
-# For training pca/autoencoder
-from compute_bomi_map import Autoencoder, PrincipalComponentAnalysis, compute_vaf
-# For displaying the gif
-from PIL import Image
+mp = LazyModule('mediapipe')
 
-pyautogui.PAUSE = 0.01  # set fps of cursor to 100Hz ish when mouse_enabled is True
+# order of the preload: what calibration needs first
+PRELOAD_MODULES = (cv2, mp, pygame, rendering, filter_butter_online, pyautogui, plt)
 
 
 class MainApplication(tk.Frame):
@@ -52,28 +71,28 @@ class MainApplication(tk.Frame):
 
         # set checkboxes for selecting joints
         self.check_nose = BooleanVar()
-        self.check2 = Checkbutton(tk_window, font='Times 18 bold', text="nose", variable=self.check_nose)
+        self.check2 = Checkbutton(parent, font='Times 18 bold', text="nose", variable=self.check_nose)
         self.check2.place(relx=0.05, rely=0.1, anchor='sw')
 
         self.check_eyes = BooleanVar()
-        self.check3 = Checkbutton(tk_window, font='Times 18 bold', text="eyes", variable=self.check_eyes)
+        self.check3 = Checkbutton(parent, font='Times 18 bold', text="eyes", variable=self.check_eyes)
         self.check3.place(relx=0.2, rely=0.1, anchor='sw')
 
         self.check_shoulders = BooleanVar()
-        self.check4 = Checkbutton(tk_window, font='Times 18 bold', text="shoulders", variable=self.check_shoulders)
+        self.check4 = Checkbutton(parent, font='Times 18 bold', text="shoulders", variable=self.check_shoulders)
         self.check4.place(relx=0.35, rely=0.1, anchor='sw')
 
         self.check_forefinger = BooleanVar()
-        self.check5 = Checkbutton(tk_window, font='Times 18 bold', text="right forefinger", variable=self.check_forefinger)
+        self.check5 = Checkbutton(parent, font='Times 18 bold', text="right forefinger", variable=self.check_forefinger)
         self.check5.place(relx=0.5, rely=0.1, anchor='sw')
 
         self.check_fingers = BooleanVar()
-        self.check6 = Checkbutton(tk_window, font='Times 18 bold', text="fingers", variable=self.check_fingers)
+        self.check6 = Checkbutton(parent, font='Times 18 bold', text="fingers", variable=self.check_fingers)
         self.check6.place(relx=0.7, rely=0.1, anchor='sw')
 
         # setting toggle checkbox for vision (default is minimal vision)
         self.check_vision = BooleanVar()
-        self.check_vision1 = Checkbutton(tk_window, font='Times 20 bold', text="Vision", variable=self.check_vision)
+        self.check_vision1 = Checkbutton(parent, font='Times 20 bold', text="Vision", variable=self.check_vision)
         self.check_vision1.place(relx=0.55, rely=0.3, anchor='sw')
 
         self.btn_num_joints = Button(parent, font='Times 22 bold', text="Select Joints", command=self.select_joints)
@@ -89,16 +108,20 @@ class MainApplication(tk.Frame):
 
         # set checkboxes for selecting BoMI map
         self.check_pca = BooleanVar(value=True)
-        self.check_pca1 = Checkbutton(tk_window, font='Times 20 bold', text="PCA", variable=self.check_pca)
+        self.check_pca1 = Checkbutton(parent, font='Times 20 bold', text="PCA", variable=self.check_pca)
         self.check_pca1.place(relx=0.35, rely=0.3, anchor='sw')
 
         self.check_ae = BooleanVar()
-        self.check_ae1 = Checkbutton(tk_window, font='Times 20 bold', text="Autoencoder", variable=self.check_ae)
+        self.check_ae1 = Checkbutton(parent, font='Times 20 bold', text="Autoencoder", variable=self.check_ae)
         self.check_ae1.place(relx=0.35, rely=0.35, anchor='sw')
 
         self.check_vae = BooleanVar()
-        self.check_vae1 = Checkbutton(tk_window, font='Times 20 bold', text="Variational AE", variable=self.check_vae)
+        self.check_vae1 = Checkbutton(parent, font='Times 20 bold', text="Variational AE", variable=self.check_vae)
         self.check_vae1.place(relx=0.35, rely=0.4, anchor='sw')
+        self.check_adapt = BooleanVar()
+        self.check_adapt1 = Checkbutton(parent, font='Times 20 bold', text="Adapt PCA map online",
+                                        variable=self.check_adapt)
+        self.check_adapt1.place(relx=0.35, rely=0.45, anchor='sw')
 
         ##
         self.btn_map = Button(parent, font='Times 22 bold', text="Calculate BoMI map", command=self.train_map)
@@ -121,31 +144,42 @@ class MainApplication(tk.Frame):
         self.btn_close.place(relx=0.05, rely=0.85, anchor='sw')
 
         # set label for number of target remaining
-        self.lbl_tgt = Label(tk_window, font='Times 22 bold', text='Number of target remaining: ')
+        self.lbl_tgt = Label(parent, font='Times 22 bold', text='Number of target remaining: ')
         self.lbl_tgt.place(relx=0.55, rely=0.7, anchor='sw')
 
         # set label for calibration
-        self.lbl_calib = Label(tk_window, font='Times 22 bold', text='Calibration time remaining: ')
+        self.lbl_calib = Label(parent, font='Times 22 bold', text='Calibration time remaining: ')
         self.lbl_calib.place(relx=0.55, rely=0.9, anchor='sw')
 
         # set checkbox
         self.check_mouse = BooleanVar()
-        self.check1 = Checkbutton(tk_window, font='Times 22 bold', text="Mouse control", variable=self.check_mouse)
+        self.check1 = Checkbutton(parent, font='Times 22 bold', text="Mouse control", variable=self.check_mouse)
         self.check1.place(relx=0.35, rely=0.5, anchor='sw')
+        self.check_process = BooleanVar()
+        self.check_process1 = Checkbutton(parent, font='Times 22 bold', text="Pose estimation in separate process",
+                                          variable=self.check_process)
+        self.check_process1.place(relx=0.35, rely=0.55, anchor='sw')
+        self.check_record = BooleanVar()
+        self.check_record1 = Checkbutton(parent, font='Times 22 bold', text="Record video and landmarks",
+                                         variable=self.check_record)
+        self.check_record1.place(relx=0.35, rely=0.6, anchor='sw')
+        self.check_roi = BooleanVar()
+        self.check_roi1 = Checkbutton(parent, font='Times 22 bold', text="Track hand region", variable=self.check_roi)
+        self.check_roi1.place(relx=0.35, rely=0.65, anchor='sw')
 
         # set ID Entry Box for subject record keeping and identification
-        self.entry_subID = Entry(tk_window, font='Times 20 bold', width='3')
+        self.entry_subID = Entry(parent, font='Times 20 bold', width='3')
         self.entry_subID.place(relx=0.35, rely=0.2, anchor='sw')
 
         # make radio button to choose the day of the experiment
-        self.radbtn_days = StringVar(tk_window, "1")
+        self.radbtn_days = StringVar(parent, "1")
         DAYS = {"Day 1": "1",
                 "Day 2": "2",
                 "Day 3": "3",
                 "Day 4": "4",
                 "Day 5": "5"}
         for text, day in DAYS.items():
-            self.radbtn1 = Radiobutton(tk_window, text=text, variable=self.radbtn_days, value=day, font='Times 20 bold').pack(anchor='sw', side='left')
+            self.radbtn1 = Radiobutton(parent, text=text, variable=self.radbtn_days, value=day, font='Times 20 bold').pack(anchor='sw', side='left')
 
 
     def select_joints(self):
@@ -202,12 +236,12 @@ class MainApplication(tk.Frame):
         self.w = popupWindow(self.master, "You will now start calibration.")
         self.master.wait_window(self.w.top)
         compute_calibration(self.calibPath, self.calib_duration, self.lbl_calib, self.num_joints, self.joints, \
-                            self.vision, self.subID, self.day)
+                            self.vision, self.subID, self.day, self.check_record, self.check_roi)
         self.btn_map["state"] = "normal"
 
     def train_map(self):
         # check whether calibration file exists first
-        if os.path.isfile(self.calibPath + "Calib.txt"):
+        if calibration_exists(self.calibPath):
             self.w = popupWindow(self.master, "You will now train BoMI map")
             self.master.wait_window(self.w.top)
             if self.check_pca.get():
@@ -247,7 +281,7 @@ class MainApplication(tk.Frame):
             # open pygame and start reaching task
             self.w = popupWindow(self.master, "You will now start practice.")
             self.master.wait_window(self.w.top)
-            start_reaching(self.drPath, self.check_mouse, self.lbl_tgt, self.num_joints, self.joints, self.dr_mode, self.vision, self.subID, self.day)
+            start_reaching(self.drPath, self.check_mouse, self.lbl_tgt, self.num_joints, self.joints, self.dr_mode, self.vision, self.subID, self.day, self.check_process, self.check_record, self.check_roi, self.check_adapt)
         else:
             self.w = popupWindow(self.master, "Perform customization first.")
             self.master.wait_window(self.w.top)
@@ -377,16 +411,19 @@ class popupWindow(object):
         self.top.destroy()
 
 
-def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, vision, subID, day):
+def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, vision, subID, day, check_record=None,
+                        check_roi=None):
     """
     function called to collect calibration data from webcam
     :param drPath: path to save calibration file
     :param calib_duration: duration of calibration as read by the textbox in the main window
     :param lbl_calib: label in the main window that shows calibration time remaining
+    :param check_record: tkinter Boolean value that enables the recording of video and landmarks
+    :param check_roi: tkinter Boolean value that runs hand estimation on a crop around the hand of the previous frames
     :return:
     """
     # Create object of openCV and Reaching (needed for terminating mediapipe thread)
-    cap = cv2.VideoCapture(1)
+    cap = open_frame_source(FRAME_SOURCE)
     r = Reaching()
 
     r.subject_id = subID
@@ -413,23 +450,25 @@ def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, v
     # holistic = mp_holistic.Holistic(min_detection_confidence=0.5, min_tracking_confidence=0.5, upper_body_only=True,
     #                                 smooth_landmarks=False)
 
-    # initialize lock for avoiding race conditions in threads
-    lock = Lock()
+    # double buffer shared by main and mediapipe threads that contains the current vector of body landmarks
+    shared_body = BodyBuffer(num_joints)
+    # body landmarks during calibration, stored in a preallocated array (at most one sample per tick at 50 Hz)
+    body_calib = CalibrationRecorder(num_joints, calib_duration, rate=50, joints=joints)
 
-    # global variable accessed by main and mediapipe threads that contains the current vector of body landmarks
-    global body
-    body = np.zeros((num_joints,))  # initialize global variable
-    body_calib = []  # initialize local variable (list of body landmarks during calibration)
+    # optional recording of the raw frames and of the hand landmarks (CalibVideo.avi, CalibLandmarks.npz)
+    recorder = SessionRecorder(drPath + "Calib") if check_record is not None and check_record.get() else None
+    roi_tracker = HandRoiTracker() if check_roi is not None and check_roi.get() else None
 
-    # start thread for OpenCV. current frame will be appended in a queue in a separate thread
-    q_frame = queue.Queue()
-    opencv_thread = Thread(target=get_data_from_camera, args=(cap, q_frame, r))
+    # start thread for OpenCV. current frame will be stored in a bounded frame buffer in a separate thread
+    frame_buf = FrameBuffer(capacity=1)
+    opencv_thread = Thread(target=get_data_from_camera, args=(cap, frame_buf, r, recorder))
     opencv_thread.start()
     print("openCV thread started in calibration.")
 
     # initialize thread for DLC/mediapipe operations
     mediapipe_thread = Thread(target=mediapipe_forwardpass,
-                              args=(hands, mp_hands, lock, q_frame, r, num_joints, joints))
+                              args=(hands, mp_hands, shared_body, frame_buf, r, num_joints, joints, None, recorder,
+                                    roi_tracker))
     mediapipe_thread.start()
     print("mediapipe thread started in calibration.")
 
@@ -438,14 +477,20 @@ def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, v
 
     print("main thread: Starting calibration...")
 
+    last_frame_id = 0  # id of the last frame stored in body_calib
+    body = np.empty((num_joints,))
+
     # -------- Main Program Loop -----------
     while not r.is_terminated:
 
         if timer_calib.elapsed_time > calib_duration:
             r.is_terminated = True
 
-        # get current value of body
-        body_calib.append(np.copy(body))
+        # get current value of body. only fresh samples are stored: a new frame where the hand was detected
+        _, frame_id, timestamp, detected, _, _ = shared_body.read_detection(body)
+        if detected and frame_id != last_frame_id:
+            body_calib.append(body, frame_id, timestamp)
+            last_frame_id = frame_id
 
         # update time elapsed label
         time_remaining = int((calib_duration - timer_calib.elapsed_time) / 1000)
@@ -456,6 +501,10 @@ def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, v
         clock.tick(50)
 
     # Stop the game engine and release the capture
+    opencv_thread.join()
+    mediapipe_thread.join()
+    if recorder is not None:
+        recorder.close()
     # pose.close()
     hands.close()
     print("pose estimation object released in calibration.")
@@ -464,10 +513,15 @@ def compute_calibration(drPath, calib_duration, lbl_calib, num_joints, joints, v
     print("openCV object released in calibration.")
 
     # print calibration file
-    body_calib = np.array(body_calib)
+    print("calibration samples: " + str(body_calib.n))
     if not os.path.exists(drPath):
         os.makedirs(drPath)
-    np.savetxt(drPath + "Calib.txt", body_calib)
+    body_calib.save(drPath + CALIB_FILE)
+
+    # first look at the data: variance explained by the first 3 principal components (from the running covariance)
+    if body_calib.n > 1:
+        _, ratio = body_calib.fit_pca(3)
+        print("variance explained by 3 PCs: " + "{:.3f}".format(np.sum(ratio)))
 
     print('Calibration finished. You can now train BoMI forward map.')
 
@@ -480,9 +534,7 @@ def train_pca(calibPath, drPath):
     """
 
     # read calibration file and remove all the initial zero rows
-    xp = list(pd.read_csv(calibPath + 'Calib.txt', sep=' ', header=None).values)
-    x = [i for i in xp if all(i)]
-    x = np.array(x)
+    x = load_calibration(calibPath)
 
     # # filter signal
     # N = 3
@@ -513,7 +565,7 @@ def train_pca(calibPath, drPath):
     # save weights and biases
     if not os.path.exists(drPath):
         os.makedirs(drPath)
-    np.savetxt(drPath + "weights1.txt", pca.components_[:, :n_pc])
+    np.savetxt(drPath + "weights1.txt", pca.components_[:n_pc].T)
 
     print('BoMI forward map (PCA parameters) has been saved.')
 
@@ -523,7 +575,7 @@ def train_pca(calibPath, drPath):
 
     # normalize latent space to fit the monitor coordinates
     # Applying rotation
-    train_pc = np.dot(train_x, pca.components_[:, :n_pc])
+    train_pc = np.dot(train_x, pca.components_[:n_pc].T)
     velocity_pc = train_pc
     rot = 0
     train_pc[0] = train_pc[0] * np.cos(np.pi / 180 * rot) - train_pc[1] * np.sin(np.pi / 180 * rot)
@@ -585,9 +637,7 @@ def train_ae(calibPath, drPath):
     activ = "tanh"
 
     # read calibration file and remove all the initial zero rows
-    xp = list(pd.read_csv(calibPath + 'Calib.txt', sep=' ', header=None).values)
-    x = [i for i in xp if all(i)]
-    x = np.array(x)
+    x = load_calibration(calibPath)
 
     # # filter signal
     # N = 3
@@ -608,8 +658,8 @@ def train_ae(calibPath, drPath):
     train_x = x[0:split, :]
     test_x = x[split:, :]
 
-    # initialize object of class Autoencoder
-    AE = Autoencoder(n_steps, lr, cu, activation=activ, nh1=nh1, seed=0)
+    # initialize object of class NumpyAutoencoder (same network as Autoencoder.train_network, trained in NumPy)
+    AE = NumpyAutoencoder(n_steps, lr, cu, activation=activ, nh1=nh1, seed=0)
 
     # train AE network
     history, ws, bs, train_x_rec, train_cu, test_x_rec, test_cu = AE.train_network(train_x, x_test=test_x)
@@ -668,27 +718,6 @@ def train_ae(calibPath, drPath):
     print('AE scaling values has been saved. You can continue with customization.')
 
 
-def load_bomi_map(dr_mode, drPath):
-    if dr_mode == 'pca':
-        map = pd.read_csv(drPath + 'weights1.txt', sep=' ', header=None).values
-    elif dr_mode == 'ae':
-        ws = []
-        bs = []
-        ws.append(pd.read_csv(drPath + 'weights1.txt', sep=' ', header=None).values)
-        ws.append(pd.read_csv(drPath + 'weights2.txt', sep=' ', header=None).values)
-        ws.append(pd.read_csv(drPath + 'weights3.txt', sep=' ', header=None).values)
-        bs.append(pd.read_csv(drPath + 'biases1.txt', sep=' ', header=None).values)
-        bs[0] = bs[0].reshape((bs[0].size,))
-        bs.append(pd.read_csv(drPath + 'biases2.txt', sep=' ', header=None).values)
-        bs[1] = bs[1].reshape((bs[1].size,))
-        bs.append(pd.read_csv(drPath + 'biases3.txt', sep=' ', header=None).values)
-        bs[2] = bs[2].reshape((bs[2].size,))
-
-        map = (ws, bs)
-
-    return map
-
-
 def initialize_customization(self, dr_mode, drPath, num_joints, joints, vision, day):
     """
     initialize objects needed for online cursor control. Start all the customization threads as well
@@ -698,17 +727,18 @@ def initialize_customization(self, dr_mode, drPath, num_joints, joints, vision,
     """
 
     # Create object of openCV, Reaching class and filter_butter3
-    cap = cv2.VideoCapture(1)
+    cap = open_frame_source(FRAME_SOURCE)
     r = Reaching()
-    filter_curs = FilterButter3("lowpass_4")
+    filter_curs = filter_butter_online.FilterButter3("lowpass_4")
 
     # initialize target position
     reaching_functions.initialize_targets(r)
 
     # Doing this for threading at the end of this function
 
-    # load BoMI forward map parameters for converting body landmarks into cursor coordinates
-    map = load_bomi_map(dr_mode, drPath)
+    # load BoMI forward map parameters and scaling values saved after training (for covering entire monitor
+    # workspace) for converting body landmarks into cursor coordinates
+    bomi_map = BomiMap.from_files(dr_mode, drPath, custom=False, rotate=True)
 
     # initialize MediaPipe Pose
     # mp_pose = mp.solutions.pose
@@ -721,40 +751,29 @@ def initialize_customization(self, dr_mode, drPath, num_joints, joints, vision,
     holistic = mp_holistic.Holistic(min_detection_confidence=0.6, min_tracking_confidence=0.6, upper_body_only=True,
                                     smooth_landmarks=False)
 
-    # load scaling values saved after training AE for covering entire monitor workspace
-    rot = pd.read_csv(drPath + 'rotation_dr.txt', sep=' ', header=None).values
-    scale = pd.read_csv(drPath + 'scale_dr.txt', sep=' ', header=None).values
-    scale = np.reshape(scale, (scale.shape[0],))
-    off = pd.read_csv(drPath + 'offset_dr.txt', sep=' ', header=None).values
-    off = np.reshape(off, (off.shape[0],))
+    # double buffer shared by main and mediapipe threads that contains the current vector of body landmarks
+    shared_body = BodyBuffer(num_joints)
 
-    # initialize lock for avoiding race conditions in threads
-    lock = Lock()
-
-    # global variable accessed by main and mediapipe threads that contains the current vector of body landmarks
-    global body
-    body = np.zeros((num_joints,))  # initialize global variable
-
-    # start thread for OpenCV. current frame will be appended in a queue in a separate thread
-    q_frame = queue.Queue()
-    opencv_thread = Thread(target=get_data_from_camera, args=(cap, q_frame, r))
+    # start thread for OpenCV. current frame will be stored in a bounded frame buffer in a separate thread
+    frame_buf = FrameBuffer(capacity=1)
+    opencv_thread = Thread(target=get_data_from_camera, args=(cap, frame_buf, r))
     opencv_thread.start()
     print("openCV thread started in customization.")
 
     # initialize thread for DLC/mediapipe operations
     mediapipe_thread = Thread(target=mediapipe_forwardpass,
-                              args=(hands, mp_hands, lock, q_frame, r, num_joints, joints))
+                              args=(hands, mp_hands, shared_body, frame_buf, r, num_joints, joints))
     mediapipe_thread.start()
     print("mediapipe thread started in customization.")
 
     # start thread for cursor control. in customization this is needed to programmatically change textbox values
     cursor_thread = Thread(target=cursor_customization,
-                           args=(self, r, filter_curs, hands, cap, map, rot, scale, off, vision))
+                           args=(self, r, filter_curs, hands, cap, shared_body, bomi_map, vision))
     cursor_thread.start()
     print("cursor control thread started in customization.")
 
 
-def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off, vision):
+def cursor_customization(self, r, filter_curs, hands, cap, shared_body, bomi_map, vision):
     """
     Function that runs in a separate thread when customization is started. A separate thread allows to concurrently
     change the values of each custom textbox in the tkinter window programmatically
@@ -764,22 +783,12 @@ def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off,
     :param cap: object of the OpenCV class for collecting webcam data
     :param filter_curs: object of FilterButter3 for online filtering of the cursor
     :param hands: object of FilterButter3 for online filtering of the cursor
+    :param shared_body: BodyBuffer written by the mediapipe thread
     :param vision: checks to see if links should be displayed or not
-    :param ws: list of the AE weights
-    :param bs: list of the AE biases
-    :param rot: rotation of the latent space defined after AE training
-    :param scale: scaling factor of the latent space defined after AE training
-    :param off: offset of the latent space defined after AE training
+    :param bomi_map: object of BomiMap (rotation, scale and offset defined after training already folded in)
     :return:
     """
 
-    # Define some colors
-    BLACK = (0, 0, 0)
-    RED = (255, 0, 0)
-    GREEN = (0, 255, 0)
-    CURSOR = (0.19 * 255, 0.65 * 255, 0.4 * 255)
-    GREY = (0.50 * 255, 0.50 * 255, 0.50 * 255)
-
     pygame.init()
 
     # The clock will be used to control how fast the screen updates
@@ -790,16 +799,18 @@ def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off,
     screen = pygame.display.set_mode(size)
     # screen = pygame.display.toggle_fullscreen()
     print(str(pygame.display.list_modes()))
+    renderer = rendering.DirtyRectRenderer(screen)
+    render_cache = rendering.RenderCache()
 
     # Defining the initial angle of rotation
-    link_rot1 = 0
-    link_rot2 = 0
-    link_rot3 = 0
+    link_rot = np.zeros((3,))
 
-    # Defining 3 link surfaces and length of links
-    link1_orig = pygame.Surface((r.link_length, 75))
-    link2_orig = pygame.Surface((r.link_length, 75))
-    link3_orig = pygame.Surface((r.link_length, 75))
+    # base of the arm and preallocated positions of base, joints and cursor
+    base = kinematics.arm_base(size[0], size[1])
+    joints_pos = np.empty((4, 2))
+
+    # preallocated snapshot of the body vector read at each frame
+    body = np.zeros((shared_body.size,))
 
     # -------- Main Program Loop -----------
     while not r.is_terminated:
@@ -807,6 +818,8 @@ def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off,
         for event in pygame.event.get():  # User did something
             if event.type == pygame.QUIT:  # If user clicked close
                 r.is_terminated = True  # Flag that we are done so we exit this loop
+            elif event.type == pygame.VIDEORESIZE or event.type == pygame.VIDEOEXPOSE:
+                renderer.screen = pygame.display.get_surface()  # redraw the whole window at the next frame
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_x:  # Pressing the x Key will quit the game
                     r.is_terminated = True
@@ -819,11 +832,11 @@ def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off,
             r.old_crs_y = r.crs_y
             r.old_crs_z = r.crs_z
 
-            # get current value of body
-            r.body = np.copy(body)
+            # get current value of body (copied into the preallocated snapshot)
+            r.body, r.frame_id, r.t_capture = shared_body.read(body)
 
             # apply BoMI forward map to body vector to obtain cursor position
-            r.crs_x, r.crs_y, r.crs_z = reaching_functions.update_cursor_position_custom_3links(r.body, map, rot, scale, off)
+            r.crs_x, r.crs_y, r.crs_z = bomi_map.forward(r.body)
 
             # Apply extra customization according to textbox values (try/except allows to catch invalid inputs)
             try:
@@ -884,113 +897,23 @@ def cursor_customization(self, r, filter_curs, hands, cap, map, rot, scale, off,
             # Set target position to update the GUI
             reaching_functions.set_target_reaching_customization(r)
 
-            # First, clear the screen to black. In between screen.fill and pygame.display.flip() all the draw
-            screen.fill(BLACK)
-
-            # draw cursor
-            # pygame.draw.circle(screen, CURSOR, (int(r.crs_x), int(r.crs_y)), r.crs_radius)
-
-            # drawing the links
-
-            # for making transparent background while rotating the image
-            link1_orig.set_colorkey(BLACK)
-            link2_orig.set_colorkey(BLACK)
-            link3_orig.set_colorkey(BLACK)
-
-            # fill the rectangle / surface with the color GREY
-            link1_orig.fill(GREY)
-            link2_orig.fill(GREY)
-            link3_orig.fill(GREY)
-
-            # creating a copy of original image for smooth rotation
-            link1 = link1_orig.copy()
-            link2 = link2_orig.copy()
-            link3 = link3_orig.copy()
-
-            # Assigning Anchor Points
-            pos1 = (size[0] / 2, size[1] * 0.85)
-
-            link1rect = link1.get_rect()
-            link2rect = link2.get_rect()
-            link3rect = link3.get_rect()
-
-            link1_anchor = (size[0] / 2, size[1] * 0.85)
-            link2_anchor = ((link1_anchor[0] + (math.cos(math.radians(link_rot1)) * link1rect.w)),
-                            link1_anchor[1] - (math.sin(math.radians(link_rot1)) * link1rect.w))
-            link3_anchor = (link2_anchor[0] + math.cos(math.radians(link_rot2)) * link2rect.w,
-                            link2_anchor[1] - (math.sin(math.radians(link_rot2)) * link2rect.w))
-            crs_anchor = (link3_anchor[0] + math.cos(math.radians(link_rot3)) * link3rect.w,
-                          link3_anchor[1] - (math.sin(math.radians(link_rot3)) * link3rect.w))
-
-            if vision == 'CompleteVision':
-
-                pygame.draw.line(screen, GREY, link1_anchor, link2_anchor, 4)
-                pygame.draw.line(screen, GREY, link2_anchor, link3_anchor, 4)
-                pygame.draw.line(screen, GREY, link3_anchor, crs_anchor, 4)
-
-                # Drawing the joints
-                pygame.draw.circle(screen, RED, link1_anchor, r.crs_radius)
-                pygame.draw.circle(screen, RED, link2_anchor, r.crs_radius)
-                pygame.draw.circle(screen, RED, link3_anchor, r.crs_radius)
-                pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-            elif vision == 'MinimalVision':
-                pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-
-            # Drawing a hologram of the cursor if cursor currently outside the window boundaries
-            if crs_anchor[1] > r.height:
-                pygame.draw.circle(screen, GREY, (crs_anchor[0], r.height), r.crs_radius * 1.25, width=2)
-            if crs_anchor[1] < 0:
-                pygame.draw.circle(screen, GREY, (crs_anchor[0], 0), r.crs_radius * 1.25, width=2)
-            if crs_anchor[0] > r.width:
-                pygame.draw.circle(screen, GREY, (r.width, crs_anchor[1]), r.crs_radius * 1.25, width=2)
-            if crs_anchor[0] < 0:
-                pygame.draw.circle(screen, GREY, (0, crs_anchor[1]), r.crs_radius * 1.25, width=2)
+            # First, clear what was drawn in the previous frame. Only the regions touched by the drawing are updated
+            renderer.begin()
+
+            # drawing the links: anchor points of the joints and of the cursor
+            kinematics.forward_kinematics(link_rot, r.link_length, base, out=joints_pos)
+            anchors = joints_pos.tolist()
 
             # Defining how much each link rotates. Will be set by PCA later.
-            link_rot1 += r.crs_x
-            link_rot2 += r.crs_y
-            link_rot3 += r.crs_z
-
-            if link_rot1 > 360: link_rot1 = link_rot1 - 360
-            if link_rot2 > 360: link_rot2 = link_rot2 - 360
-            if link_rot3 > 360: link_rot3 = link_rot3 - 360
-
-            if link_rot1 < 0: link_rot1 = link_rot1 + 360
-            if link_rot2 < 0: link_rot2 = link_rot2 + 360
-            if link_rot3 < 0: link_rot3 = link_rot3 + 360
-
-            # draw each test target
-            for i in range(8):
-                tgt_x = r.tgt_x_list[r.list_tgt[i]]
-                tgt_y = r.tgt_y_list[r.list_tgt[i]]
-                pygame.draw.circle(screen, GREEN, (int(tgt_x), int(tgt_y)), r.tgt_radius, 2)
-
-            # Display scores:
-            font = pygame.font.Font(None, 50)
-            text = font.render(str(r.score), True, RED)
-            screen.blit(text, (1250, 10))
-
-            # Debugging purposes. Displaying information online
-            vel1 = font.render("{:.3f}".format(r.crs_x), True, RED)
-            vel2 = font.render("{:.3f}".format(r.crs_y), True, RED)
-            vel3 = font.render("{:.3f}".format(r.crs_z), True, RED)
-            deg1 = font.render("{:.3f}".format(link_rot1), True, RED)
-            deg2 = font.render("{:.3f}".format(link_rot2), True, RED)
-            deg3 = font.render("{:.3f}".format(link_rot3), True, RED)
-            x_coord = font.render(str(r.crs_anchor_x), True, GREEN)
-            y_coord = font.render(str(r.crs_anchor_y), True, GREEN)
-            screen.blit(vel1, (15, 10))
-            screen.blit(vel2, (15, 60))
-            screen.blit(vel3, (15, 110))
-            screen.blit(deg1, (15, 160))
-            screen.blit(deg2, (15, 210))
-            screen.blit(deg3, (15, 260))
-            screen.blit(x_coord, (15, 310))
-            screen.blit(y_coord, (15, 320))
+            link_rot += (r.crs_x, r.crs_y, r.crs_z)
+            kinematics.wrap_angles(link_rot, out=link_rot)
 
+            # draw links, holograms of the cursor, test targets, score and debugging values from cached sprites
+            render_cache.update(r)
+            renderer.add(rendering.draw_customization_frame(screen, r, anchors, vision, link_rot, render_cache))
 
             # --- update the screen with what we've drawn.
-            pygame.display.flip()
+            renderer.end()
 
             # --- Limit to 50 frames per second
             clock.tick(50)
@@ -1033,66 +956,65 @@ def save_parameters(self, drPath):
     print('Customization values have been saved. You can continue with practice.')
 
 
-def start_reaching(drPath, check_mouse, lbl_tgt, num_joints, joints, dr_mode, vision, subID, day):
+def start_reaching(drPath, check_mouse, lbl_tgt, num_joints, joints, dr_mode, vision, subID, day, check_process=None,
+                   check_record=None, check_roi=None, check_adapt=None):
     """
     function to perform online cursor control - practice
     :param drPath: path where to load the BoMI forward map and customization values
     :param check_mouse: tkinter Boolean value that triggers mouse control instead of reaching task
     :param lbl_tgt: label in the main window that shows number of targets remaining
+    :param check_process: tkinter Boolean value that moves capture and pose estimation to a separate process
+    :param check_record: tkinter Boolean value that enables the recording of video and landmarks (threads only)
+    :param check_roi: tkinter Boolean value that runs hand estimation on a crop around the hand of the previous frames
+    :param check_adapt: tkinter Boolean value that keeps updating the PCA map with the samples of the practice
     :return:
     """
     pygame.init()
 
     # get value from checkbox - is mouse enabled?
     mouse_enabled = check_mouse.get()
+    # get value from checkbox - are capture and pose estimation run in a separate process?
+    process_enabled = check_process is not None and check_process.get()
+    # get value from checkbox - is the hand tracked in a region of the frame?
+    roi_enabled = check_roi is not None and check_roi.get()
+    # get value from checkbox - is the PCA map adapted during practice?
+    adapt_enabled = check_adapt is not None and check_adapt.get() and dr_mode == 'pca'
 
     # set parameters for mediapipe detection and tracking
     min_detection = 0.6
     min_confidence = 0.6
 
-    # Define some colors
-    BLACK = (0, 0, 0)
-    GREY = (0.50 * 255, 0.50 * 255, 0.50 * 255)
-    RED = (255, 0, 0)
-    GREEN = (0, 255, 0)
-    YELLOW = (255, 255, 0)
-    CURSOR = (0.19 * 255, 0.65 * 255, 0.4 * 255)
-
-
-    # Create object of openCV, Reaching class and filter_butter3
-    cap = cv2.VideoCapture(1)
+    # Create object of openCV (opened by the pose estimation process, if enabled), Reaching class and filter for the
+    # angular velocities (3rd order, 2 Hz at 50 Hz: same response as FilterButter3("lowpass_4"))
+    cap = None if process_enabled else open_frame_source(FRAME_SOURCE)
     r = Reaching()
-    filter_curs = FilterButter3("lowpass_4")
-
-    # Defining 3 link surfaces
-    link1_orig = pygame.Surface((r.link_length, 75))
-    link2_orig = pygame.Surface((r.link_length, 75))
-    link3_orig = pygame.Surface((r.link_length, 75))
-
-    # for making transparent background while rotating the image
-    link1_orig.set_colorkey(BLACK)
-    link2_orig.set_colorkey(BLACK)
-    link3_orig.set_colorkey(BLACK)
+    filter_curs = filter_butter_online.FilterButterworth(3, 2, 50, 3)
 
-    # fill the rectangle / surface with the color GREY
-    link1_orig.fill(GREY)
-    link2_orig.fill(GREY)
-    link3_orig.fill(GREY)
+    # rates of the control thread and of the render loop [Hz]
+    control_rate = 100
+    render_rate = 60
 
-    # creating a copy of original image for smooth rotation
-    link1 = link1_orig.copy()
-    link2 = link2_orig.copy()
-    link3 = link3_orig.copy()
+    # what drives the arm when the hand is not detected: HOLD (last pose), EXTRAPOLATE (last pose at constant
+    # velocity for up to max_extrapolation ms, then freeze) or FREEZE (the arm stops)
+    detection_policy = HOLD
+    max_extrapolation = 100
 
-    # Defining the initial angle of rotation
-    link_rot1 = 0
-    link_rot2 = 0
-    link_rot3 = 0
+    # online PCA: half life of the calibration statistics [samples] and time between two versions of the map [s]
+    adapt_half_life = 1800
+    adapt_period = 5.0
 
     # Open a new window
     size = (r.width, r.height)
+
+    # base of the arm and preallocated angles and positions of base, joints and cursor drawn at each frame
+    base = kinematics.arm_base(size[0], size[1])
+    render_rot = np.zeros((3,))
+    joints_pos = np.empty((4, 2))
     screen = pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.RESIZABLE, display=0)
     # screen = pygame.display.toggle_fullscreen()
+    renderer = rendering.DirtyRectRenderer(screen)
+    render_cache = rendering.RenderCache()
+    last_block = r.block
 
     # The clock will be used to control how fast the screen updates
     clock = pygame.time.Clock()
@@ -1104,58 +1026,96 @@ def start_reaching(drPath, check_mouse, lbl_tgt, num_joints, joints, dr_mode, vi
 
     # initialize targets and the reaching log file header
     reaching_functions.initialize_targets(r)
-    reaching_functions.write_header(r, vision, subID, day)
-
-    # load BoMI forward map parameters for converting body landmarks into cursor coordinates
-    map = load_bomi_map(dr_mode, drPath)
-
-    # initialize MediaPipe Pose
-    # mp_pose = mp.solutions.pose
-    mp_hands = mp.solutions.hands
-    # pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5, upper_body_only=True, smooth_landmarks=False)
-    hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5, max_num_hands=1)
-    mp_holistic = mp.solutions.holistic
-    holistic = mp_holistic.Holistic(min_detection_confidence=min_detection, min_tracking_confidence=min_confidence,
-                                    upper_body_only=True, smooth_landmarks=False)
-
-    # load scaling values for covering entire monitor workspace
-    rot_dr = pd.read_csv(drPath + 'rotation_dr.txt', sep=' ', header=None).values
-    scale_dr = pd.read_csv(drPath + 'scale_dr.txt', sep=' ', header=None).values
-    scale_dr = np.reshape(scale_dr, (scale_dr.shape[0],))
-    off_dr = pd.read_csv(drPath + 'offset_dr.txt', sep=' ', header=None).values
-    off_dr = np.reshape(off_dr, (off_dr.shape[0],))
-    rot_custom = pd.read_csv(drPath + 'rotation_custom.txt', sep=' ', header=None).values
-    scale_custom = pd.read_csv(drPath + 'scale_custom.txt', sep=' ', header=None).values
-    scale_custom = np.reshape(scale_custom, (scale_custom.shape[0],))
-    off_custom = pd.read_csv(drPath + 'offset_custom.txt', sep=' ', header=None).values
-    off_custom = np.reshape(off_custom, (off_custom.shape[0],))
-
-    # initialize lock for avoiding race conditions in threads
-    lock = Lock()
-
-    # global variable accessed by main and mediapipe threads that contains the current vector of body landmarks
-    global body
-    body = np.zeros((num_joints,))  # initialize global variable
-
-    # start thread for OpenCV. current frame will be appended in a queue in a separate thread
-    q_frame = queue.Queue()
-    opencv_thread = Thread(target=get_data_from_camera, args=(cap, q_frame, r))
-    opencv_thread.start()
-    print("openCV thread started in practice.")
-
-    # initialize thread for mediapipe operations
-    mediapipe_thread = Thread(target=mediapipe_forwardpass,
-                              args=(hands, mp_hands, lock, q_frame, r, num_joints, joints))
-    mediapipe_thread.start()
-    print("mediapipe thread started in practice.")
+    # columns of the log: the body vector has one entry per selected landmark coordinate
+    body_columns = LandmarkExtractor(joints).names
+    if len(body_columns) != num_joints:
+        body_columns = ["body" + str(i) for i in range(num_joints)]
+    reaching_functions.write_header(r, vision, subID, day, reaching_functions.log_columns(body_columns))
+
+    # load BoMI forward map parameters and scaling values (for covering entire monitor workspace) for converting
+    # body landmarks into cursor coordinates. Scale and offset from training and customization are folded in
+    bomi_map = BomiMap.from_files(dr_mode, drPath)
+
+    # timestamps of each frame through capture, pose estimation, map and render (toggled with the l key)
+    latency = LatencyMonitor()
+
+    if process_enabled:
+        # capture and pose estimation run in their own process (no GIL shared with control and render). The body
+        # vectors are read from a ring in shared memory, with the same API as BodyBuffer
+        pose_process = PoseProcess(num_joints, joints, source=FRAME_SOURCE, min_detection_confidence=0.5,
+                                   min_tracking_confidence=0.5, roi_tracking=roi_enabled)
+        pose_process.start()
+        pose_process.watch(r)
+        shared_body = pose_process.body
+        print("pose estimation process started in practice.")
+    else:
+        pose_process = None
+
+        # optional recording of the raw frames and of the hand landmarks, next to the results log
+        recorder = None
+        if check_record is not None and check_record.get():
+            recorder = SessionRecorder(r.path_log + "/" + vision + "/" + subID + "/PracticeDay" + str(day))
+
+        # initialize MediaPipe Pose
+        # mp_pose = mp.solutions.pose
+        mp_hands = mp.solutions.hands
+        # pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5, upper_body_only=True, smooth_landmarks=False)
+        hands = mp_hands.Hands(min_detection_confidence=0.5, min_tracking_confidence=0.5, max_num_hands=1)
+        mp_holistic = mp.solutions.holistic
+        holistic = mp_holistic.Holistic(min_detection_confidence=min_detection, min_tracking_confidence=min_confidence,
+                                        upper_body_only=True, smooth_landmarks=False)
+
+        # double buffer shared by main and mediapipe threads that contains the current vector of body landmarks
+        shared_body = BodyBuffer(num_joints)
+
+        # start thread for OpenCV. current frame will be stored in a bounded frame buffer in a separate thread
+        frame_buf = FrameBuffer(capacity=1)
+        opencv_thread = Thread(target=get_data_from_camera, args=(cap, frame_buf, r, recorder))
+        opencv_thread.start()
+        print("openCV thread started in practice.")
+
+        # initialize thread for mediapipe operations
+        mediapipe_thread = Thread(target=mediapipe_forwardpass,
+                                  args=(hands, mp_hands, shared_body, frame_buf, r, num_joints, joints, latency,
+                                        recorder, HandRoiTracker() if roi_enabled else None))
+        mediapipe_thread.start()
+        print("mediapipe thread started in practice.")
 
     # initialize thread for writing reaching log file
-    wfile_thread = Thread(target=write_practice_files, args=(r, timer_practice, vision, subID, day))
+    # the control thread pushes one record per step, the thread drains them to the binary log in batches
+    log_queue = SessionLogQueue(log_dtype(reaching_functions.practice_log_columns(body_columns)))
+    control_done = Event()  # set once the control thread has pushed its last record
+    wfile_thread = Thread(target=write_practice_files,
+                          args=(r, log_queue, vision, subID, day, body_columns, control_done))
     timer_practice.start()  # start the timer for PracticeLog
     wfile_thread.start()
     print("writing reaching log file thread started in practice.")
 
-    print("cursor control thread is about to start...")
+    # control of the arm (map, integration of the angles, reaching state machine and log) runs at a fixed rate in
+    # its own thread, so dropped frames do not change the velocity of the arm. The main loop only renders
+    controller = ArmController(r, bomi_map, shared_body, timer_enter_tgt, timer_start_trial, timer_practice,
+                               rate=control_rate, latency=latency, log_queue=log_queue, mouse_enabled=mouse_enabled,
+                               detection=MissingDetectionPolicy(num_joints, detection_policy, max_extrapolation))
+    control_thread = Thread(target=controller.run)
+    control_thread.start()
+    print("cursor control thread started in practice.")
+
+    if adapt_enabled:
+        # the PCA map starts from the calibration statistics and is rebuilt every adapt_period seconds with the
+        # samples of the practice. New versions are handed to the control thread in a single assignment
+        weights = load_bomi_map(dr_mode, drPath)
+        _, scale_dr, off_dr = load_transform(drPath, 'dr')
+        _, scale_custom, off_custom = load_transform(drPath, 'custom')
+        calibPath = os.path.dirname(os.path.normpath(drPath)) + "/"
+        pca = OnlinePCA.from_calibration(calibPath, n_pc=weights.shape[1], half_life=adapt_half_life,
+                                         reference=weights)
+        map_updater = PcaMapUpdater(pca, weights, scale_dr, off_dr, custom=(None, scale_custom, off_custom),
+                                    period=adapt_period)
+        map_thread = Thread(target=map_updater.run, args=(r, shared_body, controller))
+        map_thread.start()
+        print("map update thread started in practice.")
+    else:
+        map_updater = None
 
     # -------- Main Program Loop -----------
     while not r.is_terminated:
@@ -1163,154 +1123,38 @@ def start_reaching(drPath, check_mouse, lbl_tgt, num_joints, joints, dr_mode, vi
         for event in pygame.event.get():  # User did something
             if event.type == pygame.QUIT:  # If user clicked close
                 r.is_terminated = True  # Flag that we are done so we exit this loop
+            elif event.type == pygame.VIDEORESIZE or event.type == pygame.VIDEOEXPOSE:
+                renderer.screen = pygame.display.get_surface()  # redraw the whole window at the next frame
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_x:  # Pressing the x Key will quit the game
                     r.is_terminated = True
                 if event.key == pygame.K_p:  # Pressing the p Key will pause/resume the game
                     reaching_functions.pause_acquisition(r, timer_practice)
+                if event.key == pygame.K_l:  # Pressing the l Key will enable/disable the latency monitor
+                    print("latency monitor enabled: " + str(latency.toggle()))
                 if event.key == pygame.K_SPACE:  # Pressing the space Key will click the mouse
                     pyautogui.click(r.crs_x, r.crs_y)
 
         if not r.is_paused:
-            # Copy old cursor position
-            r.old_crs_x = r.crs_anchor_x  # changed from r.crs_x
-            r.old_crs_y = r.crs_anchor_y  # changed from r.crs_y
-
-            # get current value of body
-            r.body = np.copy(body)
-
-            # apply BoMI forward map to body vector to obtain cursor position.
-            # r.crs_x, r.crs_y, r.crs_z = reaching_functions.update_cursor_position\
-            #     (r.body, map, rot_dr, scale_dr, off_dr, rot_custom, scale_custom, off_custom)
-
-            # apply BoMI forward map to body vector to obtain 3 different degrees.
-            r.crs_x, r.crs_y, r.crs_z = reaching_functions.update_degrees\
-                (r.body, map, rot_dr, scale_dr, off_dr, rot_custom, scale_custom, off_custom)
-
-            # Assigning Anchor Points
-            pos1 = (size[0] / 2, size[1] * 0.85)
-
-            link1rect = link1.get_rect()
-            link2rect = link2.get_rect()
-            link3rect = link3.get_rect()
-
-            link1_anchor = (size[0] / 2, size[1] * 0.85)
-            link2_anchor = ((link1_anchor[0] + (math.cos(math.radians(link_rot1)) * link1rect.w)),
-                            link1_anchor[1] - (math.sin(math.radians(link_rot1)) * link1rect.w))
-            link3_anchor = (link2_anchor[0] + math.cos(math.radians(link_rot2)) * link2rect.w,
-                            link2_anchor[1] - (math.sin(math.radians(link_rot2)) * link2rect.w))
-            crs_anchor = (link3_anchor[0] + math.cos(math.radians(link_rot3)) * link3rect.w,
-                          link3_anchor[1] - (math.sin(math.radians(link_rot3)) * link3rect.w))
-
-            # Defining anchor coordinates
-            r.crs_anchor_x = crs_anchor[0]
-            r.crs_anchor_y = crs_anchor[1]
-
-            # # Moving the paddles when the user uses the arrow keys
-            # keys = pygame.key.get_pressed()
-            # if keys[pygame.K_w]:
-            #     r.crs_y -= 75
-            # if keys[pygame.K_a]:
-            #     r.crs_x -= 75
-            # if keys[pygame.K_s]:
-            #     r.crs_y += 75
-            # if keys[pygame.K_d]:
-            #     r.crs_x += 75
-
-            # Check if the crs is greater than set angle magnitude velocity:
-            max_angle_velocity = 5
-            min_angle_velocity = -5
-
-            if r.crs_x >= max_angle_velocity:
-                r.crs_x = max_angle_velocity
-            if r.crs_x <= min_angle_velocity:
-                r.crs_x = min_angle_velocity
-            if r.crs_y >= max_angle_velocity:
-                r.crs_y = max_angle_velocity
-            if r.crs_y <= min_angle_velocity:
-                r.crs_y = min_angle_velocity
-            if r.crs_z >= max_angle_velocity:
-                r.crs_z = max_angle_velocity
-            if r.crs_z <= min_angle_velocity:
-                r.crs_z = min_angle_velocity
-
-            # Filter the cursor
-            # r.crs_x, r.crs_y = reaching_functions.filter_cursor(r, filter_curs)
-
-            # Filter the angles
-            # r.crs_x, r.crs_y, r.crs_z = reaching_functions.filter_links(r, filter_curs)
-
             # if mouse checkbox was enabled do not draw the reaching GUI, only change coordinates of the computer cursor
             if mouse_enabled:
                 pyautogui.moveTo(r.crs_x, r.crs_y)
             else:
 
-                # Set target position to update the GUI
-                reaching_functions.set_target_reaching(r)
-
-                # First, clear the screen to black. In between screen.fill and pygame.display.flip() all the draw
-                screen.fill(BLACK)
-
-                # Defining how much each link rotates via PCA
-                link_rot1 += r.crs_x
-                link_rot2 += r.crs_y
-                link_rot3 += r.crs_z
-
-                if link_rot1 > 360: link_rot1 = link_rot1 - 360
-                if link_rot2 > 360: link_rot2 = link_rot2 - 360
-                if link_rot3 > 360: link_rot3 = link_rot3 - 360
-
-                if link_rot1 < 0: link_rot1 = link_rot1 + 360
-                if link_rot2 < 0: link_rot2 = link_rot2 + 360
-                if link_rot3 < 0: link_rot3 = link_rot3 + 360
-
-                r.theta1 = link_rot1
-                r.theta2 = link_rot2
-                r.theta3 = link_rot3
-
-                # Do not show the cursor in the blind trials when the cursor is outside the home target
-                if not r.is_blind:
-                    # Switching conditions on day 4
-                    if day == "4" and vision == 'CompleteVision':
-                        pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-                    elif day == "4" and vision == 'MinimalVision':
-                        pygame.draw.line(screen, GREY, link1_anchor, link2_anchor, 4)
-                        pygame.draw.line(screen, GREY, link2_anchor, link3_anchor, 4)
-                        pygame.draw.line(screen, GREY, link3_anchor, crs_anchor, 4)
-
-                        # Drawing the joints
-                        pygame.draw.circle(screen, RED, link1_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, RED, link2_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, RED, link3_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-                    elif vision == 'CompleteVision':
-
-                        pygame.draw.line(screen, GREY, link1_anchor, link2_anchor, 4)
-                        pygame.draw.line(screen, GREY, link2_anchor, link3_anchor, 4)
-                        pygame.draw.line(screen, GREY, link3_anchor, crs_anchor, 4)
-
-                        # Drawing the joints
-                        pygame.draw.circle(screen, RED, link1_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, RED, link2_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, RED, link3_anchor, r.crs_radius)
-                        pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-                    elif vision == 'MinimalVision':
-                        pygame.draw.circle(screen, CURSOR, crs_anchor, r.crs_radius * 1.25)
-
-                # draw target. green if blind, state 0 or 1. yellow if notBlind and state 2
-                if r.state == 0:  # green
-                    pygame.draw.circle(screen, GREEN, (int(r.tgt_x), int(r.tgt_y)), r.tgt_radius, 2)
-                elif r.state == 1:
-                    pygame.draw.circle(screen, GREEN, (int(r.tgt_x), int(r.tgt_y)), r.tgt_radius, 2)
-                elif r.state == 2:  # yellow
-                    if r.is_blind:  # green again if blind trial
-                        pygame.draw.circle(screen, GREEN, (int(r.tgt_x), int(r.tgt_y)), r.tgt_radius, 2)
-                    else:  # yellow if not blind
-                        pygame.draw.circle(screen, YELLOW, (int(r.tgt_x), int(r.tgt_y)), r.tgt_radius, 2)
-
-                # Drawing a hologram of the cursor if outside the boundaries
-                if crs_anchor[1] > r.height:
-                    pygame.draw.circle(screen, GREY, (crs_anchor[0], r.height), r.crs_radius * 1.25, width=2)
+                # First, clear what was drawn in the previous frame. A new block is redrawn in full
+                if r.block != last_block:
+                    renderer.invalidate()
+                    last_block = r.block
+                renderer.begin()
+
+                # angles of the links interpolated between the last two control steps, then anchor points
+                controller.render_angles(out=render_rot)
+                kinematics.forward_kinematics(render_rot, r.link_length, base, out=joints_pos)
+                anchors = joints_pos.tolist()
+
+                # draw arm (or cursor only) and target from cached sprites
+                render_cache.update(r)
+                renderer.add(rendering.draw_reaching_frame(screen, r, anchors, vision, day, render_cache))
 
                 '''# Display scores:
                 
@@ -1340,188 +1184,172 @@ def start_reaching(drPath, check_mouse, lbl_tgt, num_joints, joints, dr_mode, vi
                 screen.blit(cur_comeback, (15, 310))
                 '''
 
-                # --- update the screen with what we've drawn.
-                pygame.display.flip()
-
-                # After showing the cursor, check whether cursor is in the target
-                reaching_functions.check_target_reaching_links(r, timer_enter_tgt)
-                # Then check if cursor stayed in the target for enough time
-                reaching_functions.check_time_reaching_links(r, timer_enter_tgt, timer_start_trial, timer_practice)
+                # --- update the screen with what we've drawn (only the regions that changed)
+                renderer.end()
+                latency.mark(RENDER, r.frame_id)
 
                 # update label with number of targets remaining
                 tgt_remaining = 248 - r.trial + 1
                 lbl_tgt.configure(text='Number of targets remaining ' + str(tgt_remaining))
                 lbl_tgt.update()
 
-                # --- Limit to 50 frames per second
-                clock.tick(50)
+        # --- Limit the render rate (the control runs at its own rate in the control thread)
+        clock.tick(render_rate)
+
+    control_thread.join()
+    print("control thread joined in practice.")
+    # no more records: the log thread drains the queue one last time and closes the log
+    control_done.set()
+    wfile_thread.join()
+    if map_updater is not None:
+        map_thread.join()
+        # every version of the map, next to the results log
+        map_updater.save(r.path_log + "/" + vision + "/" + subID + "/PcaHistoryDay" + str(day) + ".npz")
+        print("map update thread joined in practice.")
 
     # Once we have exited the main program loop, stop the game engine and release the capture
     pygame.quit()
     print("game engine object released in practice.")
-    # pose.close()
-    hands.close()
-    print("pose estimation object released in practice.")
-    cap.release()
-    cv2.destroyAllWindows()
-    print("openCV object released in practice.")
-
-
-def get_data_from_camera(cap, q_frame, r):
+    if pose_process is not None:
+        # the control thread no longer reads the ring: stop the process and free the shared memory
+        pose_process.close()
+        print("pose estimation process released in practice.")
+    else:
+        opencv_thread.join()
+        mediapipe_thread.join()
+        if recorder is not None:
+            recorder.close()
+        # pose.close()
+        hands.close()
+        print("pose estimation object released in practice.")
+        cap.release()
+        cv2.destroyAllWindows()
+        print("openCV object released in practice.")
+
+    # latency report of the session, next to the results log
+    latency.write_report(r.path_log + "/" + vision + "/" + subID + "/LatencyDay" + str(day) + ".txt")
+    print(latency.format_report())
+
+
+def get_data_from_camera(cap, frame_buf, r, recorder=None):
     '''
-    function that runs in the thread to capture current frame and put it into the queue
-    :param cap: object of OpenCV class
-    :param q_frame: queue to store current frame
+    function that runs in the thread to capture current frame and put it into the frame buffer
+    :param cap: FrameSource (webcam, video file, image sequence or synthetic frames)
+    :param frame_buf: FrameBuffer to store current frame (oldest frame is dropped if pose estimation is slower)
     :param r: object of Reaching class
+    :param recorder: optional SessionRecorder. Every captured frame is queued for encoding (never blocks)
     :return:
     '''
-    while not r.is_terminated:
+    while not r.is_terminated and not cap.exhausted:
         if not r.is_paused:
-            ret, frame = cap.read()
-            q_frame.put(frame)
-    print('OpenCV thread terminated.')
+            # read directly into the preallocated slot of the frame buffer
+            ret, frame = cap.read(frame_buf.acquire())
+            if ret:
+                # same capture time for the frame buffer (log, latency) and the recording
+                timestamp = time.perf_counter()
+                frame_id = frame_buf.commit(frame, timestamp)
+                if recorder is not None:
+                    recorder.record_frame(frame, frame_id, timestamp)
+            else:
+                frame_buf.cancel()
+    frame_buf.close()
+    print('OpenCV thread terminated. Frames ' + frame_buf.stats())
 
 
-def mediapipe_forwardpass(hands, mp_hands, lock, q_frame, r, num_joints, joints):
+def mediapipe_forwardpass(hands, mp_hands, shared_body, frame_buf, r, num_joints, joints, latency=None, recorder=None,
+                          roi_tracker=None):
     """
     function that runs in the thread for estimating pose online
     :param pose: object of Mediapipe class used to predict poses
     :param mp_pose: object of Mediapipe class for extracting body landmarks
-    :param lock: lock for avoiding race condition on body vector
-    :param q_frame: queue where to append current webcam frame
+    :param shared_body: BodyBuffer where the body vector is published for the other threads
+    :param frame_buf: FrameBuffer where the current webcam frame is stored
     :param r: object of Reaching class
+    :param joints: joints selected in the main window. They define which landmarks end up in the body vector
+    :param latency: optional LatencyMonitor where the capture and pose estimation times of each frame are marked
+    :param recorder: optional SessionRecorder where the hand landmarks of every processed frame are saved
+    :param roi_tracker: optional HandRoiTracker. The hand is searched in a crop around its last position
     :return:
     """
-    global body
+    # landmarks to read are resolved once from the joint table and written straight into the back buffer
+    extractor = LandmarkExtractor(joints)
+    if latency is None:
+        latency = LatencyMonitor(capacity=1, enabled=False)
+    # BGR to RGB conversion into reused buffers
+    preprocessor = FramePreprocessor()
+
     while not r.is_terminated:
         if not r.is_paused:
             # not sure if we want to put try/catch here, just in case "ask forgiveness, not permission"
             # try:
             # get current frame from thread
-            curr_frame = q_frame.get()
-            body_list = []
-
-            # Flip the image horizontally for a later selfie-view display, and convert the BGR image to RGB.
-            image = cv2.cvtColor(cv2.flip(curr_frame, 1), cv2.COLOR_BGR2RGB)
-            # To improve performance, optionally mark the image as not writeable to pass by reference.
-            image.flags.writeable = False
-            results = hands.process(image)
+            curr_frame = frame_buf.get(timeout=0.1)
+            if curr_frame is None:
+                continue
+            latency.mark(CAPTURE, frame_buf.frame_id, frame_buf.timestamp)
+            latency.mark(POSE_START, frame_buf.frame_id)
+
+            # convert the BGR image to RGB (only the crop around the hand, if tracked). The image is not flipped:
+            # the landmarks are mirrored afterwards to get the selfie-view coordinates
+            if roi_tracker is None:
+                results = hands.process(preprocessor.convert(curr_frame))
+            else:
+                results = roi_tracker.process(hands, curr_frame, preprocessor)
+            preprocessor.mirror(results)
             # results = pose.process(image)
             # results_hands = hands.process(image)
+            if recorder is not None:
+                recorder.record_landmarks(results, frame_buf.frame_id, frame_buf.timestamp)
 
-            # if joints[0, 0] == 1 or joints[1, 0] == 1 or joints[2, 0] == 1:
-            #     if not results.pose_landmarks:
-            #         continue
-            #     if joints[0, 0] == 1:
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.NOSE].x)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.NOSE].y)
-            #     if joints[1, 0] == 1:
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.RIGHT_EYE].x)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.RIGHT_EYE].y)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.LEFT_EYE].x)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.LEFT_EYE].y)
-            #     if joints[2, 0] == 1:
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.RIGHT_SHOULDER].x)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.RIGHT_SHOULDER].y)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.LEFT_SHOULDER].x)
-            #         body_list.append(results.pose_landmarks.landmark[mp_holistic.PoseLandmark.LEFT_SHOULDER].y)
-
-            if joints[3, 0] == 1 or joints[4, 0] == 1:
-                if not results.multi_hand_landmarks:
-                    continue
-                # body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x)
-                # body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y)
-                if joints[4, 0] == 1:
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.WRIST].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.WRIST].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_CMC].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_CMC].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_MCP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_MCP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_IP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_IP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_TIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.THUMB_TIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_DIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_DIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_DIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_DIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_MCP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_MCP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_PIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_PIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_DIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_DIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_TIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.RING_FINGER_TIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_MCP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_MCP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_PIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_PIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_DIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_DIP].y)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_TIP].x)
-                    body_list.append(results.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.PINKY_TIP].y)
-
-            body_mp = np.array(body_list)
-            q_frame.queue.clear()
+            # if any of the selected landmarks was not detected, the last valid vector is held and flagged as missed
+            if not extractor.extract(results, shared_body.back):
+                shared_body.publish_missed(frame_buf.frame_id, frame_buf.timestamp)
+                continue
+            latency.mark(POSE, frame_buf.frame_id)
 
             # body_mp = np.reshape(body_mp_temp[np.argwhere(body_mp_temp)], ((num_joints*2,)))
             # body_mp = np.array((n_x, n_y, ls_x, ls_y, rs_x, rs_y))
             # body = np.divide(body_mp, norm)
-            with lock:
-                body = np.copy(body_mp)
+            shared_body.publish(frame_buf.frame_id, frame_buf.timestamp, score=detection_score(results))
             # except:
             #     print('Expection in mediapipe_forwardpass. Closing thread')
             #     r.is_terminated = True
+    if roi_tracker is not None:
+        print('Hand region ' + roi_tracker.stats())
+    print('Preprocessing ' + preprocessor.stats())
     print('Mediapipe_forwardpass thread terminated.')
 
 
-def write_practice_files(r, timer_practice, vision, subID, day):
+def write_practice_files(r, log_queue, vision, subID, day, body_columns, control_done):
     """
     function that runs in the thread for writing reaching log in a file
     :param r: object of Reaching class
-    :param timer_practice: stopwatch that keeps track of elapsed time during reaching
+    :param log_queue: SessionLogQueue where the control loop pushes one record per tick
+    :param body_columns: names of the body vector entries (columns of the log)
+    :param control_done: threading.Event set after the control thread has been joined
     :return:
     """
 
     data_path = (r.path_log + "/" + vision + "/" + subID + "/")
 
-    while not r.is_terminated:
-        if not r.is_paused:
-            starttime = time.time()
-
-            ''' log = str(timer_practice.elapsed_time) + "\t" + '\t'.join(map(str, r.body)) + "\t" + str(r.crs_x) + "\t" + \
-                  str(r.crs_y) + "\t" + str(r.block) + "\t" + \
-                  str(r.repetition) + "\t" + str(r.target) + "\t" + str(r.trial) + "\t" + str(r.state) + "\t" + \
-                  str(r.comeback) + "\t" + str(r.is_blind) + "\t" + str(r.at_home) + "\t" + str(r.count_mouse) + "\t" + \
-                  str(r.score) + "\n"
-            '''
-
-            log = str(timer_practice.elapsed_time) + "\t" + str(r.reach_time) + "\t" + '\t'.join(map(str, body)) + "\t" + str(r.theta1) + "\t" + \
-                  str(r.theta2) + "\t" + str(r.theta3) + "\t" + str(r.crs_x) + "\t" + \
-                  str(r.crs_y) + "\t" + str(r.crs_z) + "\t" +  str(r.crs_anchor_x) + "\t" + str(r.crs_anchor_y) + "\t" + \
-                 str(r.target) + "\t" + str(r.trial) + "\t" + str(r.state) + "\t" + str(r.comeback) + \
-                "\t" + str(r.at_home) + "\t" + str(r.score) + "\t" + str(r.distance) + "\t" + str(r.epoch) + "\n"
-
-            with open(data_path + "ResultsLogDay" + str(day) + ".txt", "a") as file_log:
-                file_log.write(log)
-
-            # write @ 50 Hz
-            time.sleep(0.033 - ((time.time() - starttime) % 0.033))
-
+    # fixed-width binary records, converted to the tab separated ResultsLogDay file at the end of the session
+    log_path = data_path + "ResultsLogDay" + str(day) + ".bin"
+    session_log = SessionLogWriter(log_path, reaching_functions.practice_log_columns(body_columns))
+
+    try:
+        # records are written in batches, so the thread only needs to wake up a few times per second
+        while not control_done.is_set():
+            log_queue.drain(session_log)
+            control_done.wait(0.1)
+
+        # the control thread has ended: nothing can be pushed after this drain
+        log_queue.drain(session_log)
+    finally:
+        # whatever happened, keep the records written so far
+        session_log.close()
+        to_tsv(log_path, data_path + "ResultsLogDay" + str(day) + ".txt",
+               reaching_functions.log_columns(body_columns))
+        print('Records logged: ' + str(log_queue.written) + '/' + str(log_queue.pushed))
     print('Writing reaching log file thread terminated.')
 
 
@@ -1534,5 +1362,8 @@ if __name__ == "__main__":
 
     MainApplication(tk_window).pack(side="top", fill="both", expand=True)
 
+    # import mediapipe, pygame, ... in the background once the window is shown
+    tk_window.after(200, preload, PRELOAD_MODULES)
+
     # initiate Tkinter mainloop
     tk_window.mainloop()
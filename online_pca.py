@@ -0,0 +1,204 @@
+import os
+import time
+
+import numpy as np
+
+from bomi_map import BomiMap
+from calibration_recorder import CALIB_FILE, load_calibration
+
+
+class OnlinePCA:
+    """
+    Class that keeps an exponentially weighted estimate of mean and covariance of the body vectors and extracts the
+    first n_pc principal components from it on request. It starts from the statistics of the calibration, so the
+    first components are those of the calibration data, and then drifts towards the recent samples with the given
+    half life. Components are kept in the same order and with the same sign as the previous ones, so the map does
+    not flip or swap axes when it is updated
+    """
+
+    def __init__(self, mean, covariance, n_pc=3, half_life=1800, reference=None):
+        """
+        :param mean: initial mean (e.g. of the calibration samples)
+        :param covariance: initial covariance
+        :param n_pc: number of principal components
+        :param half_life: number of samples after which the weight of the past is halved
+        :param reference: optional weights (n_inputs x n_pc) the first components are aligned to (trained map)
+        """
+        self._mean = np.array(mean, dtype=float)
+        self._cov = np.array(covariance, dtype=float)
+        self._n_pc = n_pc
+        self._alpha = 1 - 0.5 ** (1 / half_life)
+        self._delta = np.zeros_like(self._mean)
+        self._outer = np.zeros_like(self._cov)
+        self._samples = 0
+        self._components = None if reference is None else np.array(reference, dtype=float)
+
+    @classmethod
+    def from_calibration(cls, calibPath, n_pc=3, half_life=1800, reference=None):
+        """
+        start from the mean and covariance saved with the calibration (computed again from the samples for
+        calibrations saved by older versions)
+        :param calibPath: folder of the calibration
+        :return: object of OnlinePCA
+        """
+        if os.path.isfile(calibPath + CALIB_FILE):
+            with np.load(calibPath + CALIB_FILE) as data:
+                return cls(data['mean'], data['covariance'], n_pc, half_life, reference)
+        x = load_calibration(calibPath)
+        return cls(np.mean(x, axis=0), np.cov(x, rowvar=False), n_pc, half_life, reference)
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def covariance(self):
+        return self._cov
+
+    @property
+    def samples(self):
+        """number of samples added after the initial statistics"""
+        return self._samples
+
+    def partial_fit(self, x):
+        """
+        add a sample: mean += a (x - mean), cov = (1 - a) (cov + a (x - mean)(x - mean)^T)
+        :param x: body vector
+        :return:
+        """
+        np.subtract(x, self._mean, out=self._delta)
+        self._mean += self._alpha * self._delta
+        np.multiply.outer(self._delta, self._delta, out=self._outer)
+        self._outer *= self._alpha
+        self._cov += self._outer
+        self._cov *= 1 - self._alpha
+        self._samples += 1
+
+    def components(self):
+        """
+        :return: weights (n_inputs x n_pc), variance along each component (n_pc,)
+        """
+        eigval, eigvec = np.linalg.eigh(self._cov)
+        order = np.argsort(eigval)[::-1]
+        eigval = eigval[order]
+        eigvec = eigvec[:, order]
+        w = eigvec[:, :self._n_pc].copy()
+        var = eigval[:self._n_pc].copy()
+
+        if self._components is not None:
+            # match each previous component to the closest new one (among the first 2 n_pc), then fix the sign
+            candidates = eigvec[:, :2 * self._n_pc]
+            similarity = np.abs(self._components.T @ candidates)
+            taken = set()
+            for k in range(self._n_pc):
+                j = max((j for j in range(candidates.shape[1]) if j not in taken), key=lambda j: similarity[k, j])
+                taken.add(j)
+                w[:, k] = candidates[:, j]
+                var[k] = eigval[j]
+                if np.dot(w[:, k], self._components[:, k]) < 0:
+                    w[:, k] = -w[:, k]
+        self._components = w
+        return w, var
+
+
+class PcaMapUpdater:
+    """
+    Class that adapts the PCA map to the subject during practice. It runs in its own thread: fresh samples read from
+    the body buffer are added to an OnlinePCA and every period seconds a new BomiMap is built and handed to the
+    control loop in a single assignment (ArmController.set_map), so the control never sees a half-updated map.
+    The scale of each component is corrected so that the output keeps the variance it had with the trained map
+    (same gain for the subject) and the offset is recomputed from the current mean.
+    Every published version is kept and saved at the end (weights, scale, offset, mean, variances)
+    """
+
+    def __init__(self, pca, weights, scale, offset, custom=None, period=5.0):
+        """
+        :param pca: object of OnlinePCA, initialized with the calibration statistics
+        :param weights: trained PCA weights (n_inputs x n_pc), i.e. version 0
+        :param scale: scale applied to the output of the trained map (scale_dr)
+        :param offset: offset applied to the output of the trained map (offset_dr)
+        :param custom: optional (rot, scale, off) of the customization, applied after the map
+        :param period: time between two updates of the map [s]
+        """
+        self._pca = pca
+        self._custom = custom
+        self._period = period
+        self._scale0 = np.asarray(scale, dtype=float)
+        # variance of the calibration data along the trained weights: the target gain of every version
+        weights = np.asarray(weights, dtype=float)
+        self._var0 = np.einsum('ik,ij,jk->k', weights, pca.covariance, weights)
+        self._version = 0
+        self._history = {'version': [0], 'time': [0.0], 'samples': [0], 'weights': [weights],
+                         'scale': [self._scale0], 'offset': [np.asarray(offset, dtype=float)],
+                         'mean': [pca.mean.copy()], 'variance': [self._var0.copy()]}
+        self._t0 = None
+
+    @property
+    def version(self):
+        return self._version
+
+    def build_map(self):
+        """
+        compute the components from the current statistics and the map that uses them
+        :return: object of BomiMap, weights, scale, offset, variance along the components
+        """
+        w, var = self._pca.components()
+        scale = self._scale0 * np.sqrt(self._var0 / np.maximum(var, 1e-12))
+        offset = -(self._pca.mean @ w) * scale
+        transforms = [(None, scale, offset)]
+        if self._custom is not None:
+            transforms.append(self._custom)
+        return BomiMap(w, transforms), w, scale, offset, var
+
+    def run(self, r, shared_body, controller):
+        """
+        function that runs in the map update thread until r.is_terminated
+        :param r: object of Reaching class
+        :param shared_body: BodyBuffer written by the pose estimation thread
+        :param controller: ArmController whose map is replaced
+        :return:
+        """
+        self._t0 = time.perf_counter()
+        body = np.zeros((shared_body.size,))
+        last_frame_id = 0
+        next_update = self._t0 + self._period
+        while not r.is_terminated:
+            _, frame_id, _, detected, _, _ = shared_body.read_detection(body)
+            if detected and frame_id != last_frame_id and not r.is_paused:
+                self._pca.partial_fit(body)
+                last_frame_id = frame_id
+            now = time.perf_counter()
+            if now >= next_update:
+                next_update = now + self._period
+                if self._pca.samples > 0:
+                    self.publish(controller, now)
+            time.sleep(0.005)
+        print('Map update thread terminated. Versions: ' + str(self._version))
+
+    def publish(self, controller, now=None):
+        """
+        build a new version of the map and hand it to the control loop
+        :return:
+        """
+        if now is None:
+            now = time.perf_counter()
+        bomi_map, w, scale, offset, var = self.build_map()
+        self._version += 1
+        controller.set_map(bomi_map, self._version)
+        history = self._history
+        history['version'].append(self._version)
+        history['time'].append(now - (self._t0 if self._t0 is not None else now))
+        history['samples'].append(self._pca.samples)
+        history['weights'].append(w)
+        history['scale'].append(scale)
+        history['offset'].append(offset)
+        history['mean'].append(self._pca.mean.copy())
+        history['variance'].append(var)
+
+    def save(self, path):
+        """
+        save every version of the map
+        :param path: output npz file
+        :return:
+        """
+        np.savez(path, **{key: np.array(value) for key, value in self._history.items()})
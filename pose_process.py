@@ -0,0 +1,295 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from threading import Thread
+
+import numpy as np
+
+
+class SharedPoseRing:
+    """
+    Class that hands body vectors from the pose estimation process to the control/render process through a ring of
+    slots in shared memory. The writer fills the slot after the last published one and then publishes it by
+    increasing a counter; each slot has its own sequence number (odd while it is being written), so readers retry if
+    the slot they copied was overwritten in the meantime (seqlock-style, single writer, no locks).
+    The reader side has the same read() / read_detection() API as BodyBuffer
+    """
+
+    def __init__(self, size, slots=8, name=None):
+        """
+        :param size: length of the body vector
+        :param slots: number of slots of the ring (a reader fails only if the writer laps it during one copy)
+        :param name: name of an existing ring to attach to, from a process started by its owner (see PoseProcess).
+        If None, a new shared memory block is created and owned by this object: only the owner unlinks it in close()
+        """
+        header = 8
+        nbytes = header + slots * (8 + 8 + 8 + 8 + 8 + 8 + 4 * size)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._owner = True
+        else:
+            # attaching registers the block with the resource tracker again, which would unlink it a second time (or
+            # report it as leaked) at shutdown. track=False skips it (python >= 3.13); on older versions the process
+            # started by PoseProcess (spawn) shares the tracker of the owner, where the name is already registered,
+            # so the block is still unlinked once. Unregistering it here would drop the owner's registration too
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+
+        buf = self._shm.buf
+        offset = header
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._frame_id = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._timestamp = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._detected = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._score = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._t_valid = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += 8 * slots
+        self._body = np.ndarray((slots, size), dtype=np.float32, buffer=buf, offset=offset)
+        if self._owner:
+            self._count[0] = 0
+            self._slot_seq[:] = 0
+
+        # copy returned by read() when no output array is given (views of shared memory are not safe to keep)
+        self._out = np.zeros((size,), dtype=np.float32)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def size(self):
+        return self._body.shape[1]
+
+    @property
+    def slots(self):
+        return self._body.shape[0]
+
+    @property
+    def seq(self):
+        """number of vectors published so far"""
+        return int(self._count[0])
+
+    @property
+    def back(self):
+        """slot the writer has to fill before calling publish(). Only the writer may use it"""
+        idx = self._count[0] % self.slots
+        self._slot_seq[idx] = 2 * self._count[0] + 1
+        return self._body[idx]
+
+    def publish(self, frame_id, timestamp, detected=True, score=1.0):
+        """
+        make the slot returned by back visible to the readers
+        :param frame_id: id of the frame the body vector was estimated from
+        :param timestamp: capture time of that frame (time.perf_counter, seconds)
+        :param detected: whether the pose was detected in the frame (use publish_missed() when it was not)
+        :param score: confidence of the detection [0, 1]
+        :return:
+        """
+        count = self._count[0]
+        idx = count % self.slots
+        self._frame_id[idx] = frame_id
+        self._timestamp[idx] = timestamp
+        self._detected[idx] = detected
+        self._score[idx] = score
+        if detected:
+            self._t_valid[idx] = timestamp
+        else:
+            self._t_valid[idx] = self._t_valid[(count - 1) % self.slots] if count > 0 else 0.0
+        self._slot_seq[idx] = 2 * count + 2
+        self._count[0] = count + 1
+
+    def publish_missed(self, frame_id, timestamp):
+        """
+        publish that the pose was not detected in a frame. The last valid vector is held in the new slot
+        :param frame_id: id of the frame
+        :param timestamp: capture time of the frame (time.perf_counter, seconds)
+        :return:
+        """
+        count = self._count[0]
+        back = self.back
+        if count > 0:
+            np.copyto(back, self._body[(count - 1) % self.slots])
+        else:
+            back[:] = 0
+        self.publish(frame_id, timestamp, detected=False, score=0.0)
+
+    def read(self, out=None):
+        """
+        get the latest body vector without blocking the writer
+        :param out: optional preallocated array. If None, an internal array is used (overwritten at the next call)
+        :return: body vector, frame id, capture timestamp
+        """
+        return self.read_detection(out)[:3]
+
+    def read_detection(self, out=None):
+        """
+        same as read(), with the detection state of the frame
+        :param out: optional preallocated array. If None, an internal array is used (overwritten at the next call)
+        :return: body vector, frame id, capture timestamp, detected, detection score, capture time of the last frame
+        where the pose was detected (0 if never)
+        """
+        if out is None:
+            out = self._out
+        while True:
+            count = self._count[0]
+            if count == 0:
+                out[:] = 0
+                return out, 0, 0.0, False, 0.0, 0.0
+            idx = (count - 1) % self.slots
+            seq = self._slot_seq[idx]
+            frame_id = int(self._frame_id[idx])
+            timestamp = float(self._timestamp[idx])
+            detected = bool(self._detected[idx])
+            score = float(self._score[idx])
+            t_valid = float(self._t_valid[idx])
+            np.copyto(out, self._body[idx], casting='unsafe')
+            if seq == 2 * count and self._slot_seq[idx] == seq:
+                return out, frame_id, timestamp, detected, score, t_valid
+
+    def close(self):
+        """
+        detach from the shared memory block (and free it, if this object created it)
+        :return:
+        """
+        # drop the numpy views first, the block cannot be closed while they exist
+        self._count = self._slot_seq = self._frame_id = self._timestamp = self._body = None
+        self._detected = self._score = self._t_valid = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def run_pose_estimation(ring_name, size, slots, joints, source, min_detection_confidence, min_tracking_confidence,
+                        roi_tracking, stop):
+    """
+    function that runs in the pose estimation process: capture a frame, estimate the hand landmarks and publish the
+    body vector in the shared ring, until stop is set
+    :param ring_name: name of the SharedPoseRing created by the parent process
+    :param size: length of the body vector
+    :param slots: number of slots of the ring
+    :param joints: joints selected in the main window
+    :param source: frame source (see frame_source.open_frame_source)
+    :param roi_tracking: search the hand in a crop around its last position (see HandRoiTracker)
+    :param stop: multiprocessing Event set by the parent to terminate the process
+    :return:
+    """
+    # heavy modules are imported only in the child process
+    import mediapipe as mp_solutions
+    from landmarks import LandmarkExtractor, detection_score
+    from frame_source import open_frame_source
+    from roi_tracker import HandRoiTracker
+    from frame_preprocessor import FramePreprocessor
+
+    ring = SharedPoseRing(size, slots, name=ring_name)
+    extractor = LandmarkExtractor(joints)
+    cap = open_frame_source(source)
+    hands = mp_solutions.solutions.hands.Hands(min_detection_confidence=min_detection_confidence,
+                                               min_tracking_confidence=min_tracking_confidence, max_num_hands=1)
+    roi_tracker = HandRoiTracker() if roi_tracking else None
+    preprocessor = FramePreprocessor()
+    frame_id = 0
+    frame = None
+    try:
+        while not stop.is_set() and not cap.exhausted:
+            ret, frame = cap.read(frame)
+            if not ret:
+                continue
+            frame_id += 1
+            timestamp = time.perf_counter()
+
+            # BGR to RGB into reused buffers, no flip: the landmarks are mirrored afterwards (selfie view)
+            if roi_tracker is None:
+                results = hands.process(preprocessor.convert(frame))
+            else:
+                results = roi_tracker.process(hands, frame, preprocessor)
+            preprocessor.mirror(results)
+
+            # if any of the selected landmarks was not detected, the last valid vector is held
+            if extractor.extract(results, ring.back):
+                ring.publish(frame_id, timestamp, score=detection_score(results))
+            else:
+                ring.publish_missed(frame_id, timestamp)
+    finally:
+        hands.close()
+        cap.release()
+        ring.close()
+    print('Pose estimation process terminated. Frames: ' + str(frame_id))
+
+
+class PoseProcess:
+    """
+    Class that runs capture and pose estimation in a separate process, so that they do not compete for the GIL with
+    the control and render loop. The body vectors are read through body (SharedPoseRing, same API as BodyBuffer)
+    """
+
+    def __init__(self, size, joints, source=1, slots=8, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 roi_tracking=False):
+        """
+        :param size: length of the body vector
+        :param joints: joints selected in the main window
+        :param source: frame source (webcam index, 'synthetic', image directory or video file)
+        :param slots: number of slots of the shared ring
+        :param roi_tracking: search the hand in a crop around its last position (see HandRoiTracker)
+        """
+        ctx = mp.get_context('spawn')
+        self._ring = SharedPoseRing(size, slots)
+        self._stop = ctx.Event()
+        self._process = ctx.Process(target=run_pose_estimation,
+                                    args=(self._ring.name, size, slots, joints, source, min_detection_confidence,
+                                          min_tracking_confidence, roi_tracking, self._stop),
+                                    daemon=True)
+        self._watcher = None
+
+    @property
+    def body(self):
+        return self._ring
+
+    @property
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def start(self):
+        self._process.start()
+
+    def watch(self, r):
+        """
+        stop the process when r.is_terminated becomes True
+        :param r: object of Reaching class
+        :return:
+        """
+        def wait_for_termination():
+            while not r.is_terminated:
+                time.sleep(0.1)
+            self.stop()
+
+        self._watcher = Thread(target=wait_for_termination, daemon=True)
+        self._watcher.start()
+
+    def stop(self, timeout=5):
+        """
+        ask the process to terminate and wait for it (it is killed after timeout seconds)
+        :return:
+        """
+        self._stop.set()
+        if self._process.pid is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+
+    def close(self):
+        """
+        stop the process and free the shared memory. body cannot be read anymore
+        :return:
+        """
+        self.stop()
+        self._ring.close()
@@ -6,10 +6,10 @@ class Reaching:
     """
     Class that contains all the parameters for handling the reaching task
     """
-    def __init__(self):
-        # pygame parameters
-        self._width = 3840
-        self._height = 2160
+    def __init__(self, width=3840, height=2160):
+        # pygame parameters (size of the window, the other dimensions of the GUI scale with width)
+        self._width = width
+        self._height = height
         self._velocity3 = 3
         self._crs_radius = self.width/150
         self._tgt_radius = self.width/50
@@ -41,6 +41,7 @@ class Reaching:
         self._is_vision = 1
         self._at_home = 1
         self._count_mouse = 0
+        self._still_time = 0  # time the cursor has been still in a blind trial [ms]
         self._crs_x = self._width / 2
         self._crs_y = self._height / 2
         self._crs_z = self._velocity3
@@ -52,6 +53,11 @@ class Reaching:
         self._old_crs_x = self._crs_x
         self._old_crs_y = self._crs_y
         self._body = np.zeros((6,))
+        self._frame_id = 0
+        self._t_capture = 0
+        self._detected = 0
+        self._detection_score = 0
+        self._body_age = 0
         self._tgt_x = 0
         self._tgt_y = 0
         self._score = 0
@@ -229,6 +235,14 @@ class Reaching:
     def count_mouse(self, value):
         self._count_mouse = value
 
+    @property
+    def still_time(self):
+        return self._still_time
+
+    @still_time.setter
+    def still_time(self, value):
+        self._still_time = value
+
     @property
     def body(self):
         return self._body
@@ -237,6 +251,46 @@ class Reaching:
     def body(self, value):
         self._body = value
 
+    @property
+    def frame_id(self):
+        return self._frame_id
+
+    @frame_id.setter
+    def frame_id(self, value):
+        self._frame_id = value
+
+    @property
+    def t_capture(self):
+        return self._t_capture
+
+    @t_capture.setter
+    def t_capture(self, value):
+        self._t_capture = value
+
+    @property
+    def detected(self):
+        return self._detected
+
+    @detected.setter
+    def detected(self, value):
+        self._detected = value
+
+    @property
+    def detection_score(self):
+        return self._detection_score
+
+    @detection_score.setter
+    def detection_score(self, value):
+        self._detection_score = value
+
+    @property
+    def body_age(self):
+        return self._body_age
+
+    @body_age.setter
+    def body_age(self, value):
+        self._body_age = value
+
     @property
     def crs_x(self):
         return self._crs_x
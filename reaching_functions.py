@@ -1,12 +1,61 @@
 import numpy as np
-import pandas as pd
-from scipy import signal as sgn
 import ctypes
 
 import os
 
 
-def write_header(r, vision, subID, day):
+# columns of the ResultsLogDay file written during practice
+LOG_COLUMNS = ["time", "reach_time"] + \
+    ["wrist_x", "wrist_y", "thumb_cmc_x", "thumb_cmc_y",
+     "thumb_mcp_x", "thumb_mcp_y", "thumb_ip_x", "thump_ip_y",
+     "thumb_tip_x", "thumb_tip_y", "index_finger_mcp_x", "index_finger_mcp_y",
+     "index_finger_pip_x", "index_finger_pip_y", "index_finger_dip_x", "index_finger_dip_y",
+     "index_finger_tip_x", "index_finger_tip_y", "middle_finger_mcp_x", "middle_finger_mcp_y",
+     "middle_finger_pip_x", "middle_finger_pip_y", "middle_finger_dip_x", "middle_finger_dip_y",
+     "middle_finger_tip_x", "middle_finger_tip_y", "ring_finger_mcp_x", "ring_finger_mcp_y",
+     "ring_finger_pip_x", "ring_finger_pip_y", "ring_finger_dip_x", "ring_finger_dip_y",
+     "ring_finger_tip_x", "ring_finger_tip_y", "pinky_mcp_x", "pinky_mcp_y",
+     "pinky_pip_x", "pinky_pip_y", "pinky_dip_x", "pinky_dip_y",
+     "pinky_tip_x", "pinky_tip_y"] + \
+    ["theta1", "theta2", "theta3", "omega1", "omega2", "omega3", "cursor_x", "cursor_y",
+     "target", "trial", "state", "comeback", "at_home", "score", "distance", "reach"]
+
+# columns that follow the body landmarks in LOG_COLUMNS
+LOG_TAIL = LOG_COLUMNS[-16:]
+N_LOG_TAIL = len(LOG_TAIL)
+
+# columns added to each row of the binary practice log: the pose it was computed from, whether the pose was
+# detected in that frame, the detection score, the age of the last detected pose [ms] and the version of the map
+PRACTICE_LOG_EXTRA = ["frame_id", "t_capture", "detected", "detection_score", "body_age", "map_version"]
+PRACTICE_LOG_COLUMNS = LOG_COLUMNS + PRACTICE_LOG_EXTRA
+
+
+# blind trials end when the cursor stays still (slower than BLIND_MAX_SPEED along x and y) for BLIND_HOLD_TIME.
+# Same criterion as the original 50 Hz loop (less than 10 px per tick for 100 ticks), independent of the rate
+BLIND_MAX_SPEED = 500  # [px/s]
+BLIND_HOLD_TIME = 2000  # [ms]
+# tick of the original loop, for the callers that do not measure the time step
+NOMINAL_TICK = 20  # [ms]
+
+
+def log_columns(body_columns):
+    """
+    columns of the ResultsLogDay file for the body vector of a session (its length depends on the selected joints)
+    :param body_columns: names of the body vector entries (e.g. LandmarkExtractor(joints).names)
+    :return: list of column names
+    """
+    return ["time", "reach_time"] + list(body_columns) + LOG_TAIL
+
+
+def practice_log_columns(body_columns):
+    """
+    :param body_columns: names of the body vector entries
+    :return: columns of the binary practice log
+    """
+    return log_columns(body_columns) + PRACTICE_LOG_EXTRA
+
+
+def write_header(r, vision, subID, day, columns=None):
     # First check whether Practice folder exists. If not, create it
 
     # print(vision)
@@ -25,15 +74,7 @@ def write_header(r, vision, subID, day):
                                          "Overwrite File Protection", 2)
         exit()
 
-    header = "time\treach_time\twrist_x\twrist_y\tthumb_cmc_x\tthumb_cmc_y\tthumb_mcp_x\tthumb_mcp_y\tthumb_ip_x\tthump_ip_y\t"\
-             "thumb_tip_x\tthumb_tip_y\tindex_finger_mcp_x\tindex_finger_mcp_y\tindex_finger_pip_x\tindex_finger_pip_y"\
-             "\tindex_finger_dip_x\tindex_finger_dip_y\tindex_finger_tip_x\tindex_finger_tip_y\tmiddle_finger_mcp_x\t"\
-             "middle_finger_mcp_y\tmiddle_finger_pip_x\tmiddle_finger_pip_y\tmiddle_finger_dip_x\tmiddle_finger_dip_y"\
-             "\tmiddle_finger_tip_x\tmiddle_finger_tip_y\tring_finger_mcp_x\tring_finger_mcp_y\tring_finger_pip_x\t"\
-             "ring_finger_pip_y\tring_finger_dip_x\tring_finger_dip_y\tring_finger_tip_x\tring_finger_tip_y\t" \
-             "pinky_mcp_x\tpinky_mcp_y\tpinky_pip_x\tpinky_pip_y\tpinky_dip_x\tpinky_dip_y\tpinky_tip_x\tpinky_tip_y\t"\
-             "theta1\ttheta2\ttheta3\tomega1\tomega2\tomega3\tcursor_x\tcursor_y\ttarget\ttrial\tstate\tcomeback" \
-             "\tat_home\tscore\tdistance\treach\n"
+    header = "\t".join(LOG_COLUMNS if columns is None else columns) + "\n"
     with open(data_path + "ResultsLogDay" + str(day) + ".txt", "w+") as file_log:
         file_log.write(header)
 
@@ -91,13 +132,9 @@ def filter_cursor(r, filter_curs):
 
     return filter_curs.filtered_value[0], filter_curs.filtered_value[1]
 
-def filter_links(r, filter_curs):
-
-    filter_curs.update_cursor(r.crs_x, 0)
-    filter_curs.update_cursor(r.crs_y, 1)
-    filter_curs.update_cursor(r.crs_z, 2)
-
-    return filter_curs.filtered_value[0], filter_curs.filtered_value[1], filter_curs.filtered_value[2]
+def filter_links(r, filters):
+    # filters: FilterButterworth with 3 channels, the three angular velocities are filtered in one step
+    return tuple(filters.update((r.crs_x, r.crs_y, r.crs_z)).tolist())
 
 
 def update_cursor_position_custom(body, map, rot, scale, off):
@@ -212,9 +249,10 @@ def write_practice_files(r, body, timer_practice):
         file_log.write(log)
 
 
-def check_target_reaching(r, timer_enter_tgt):
+def check_target_reaching(r, timer_enter_tgt, dt=NOMINAL_TICK):
     """
     Check if cursor is inside the target
+    :param dt: time elapsed since the previous call [ms]
     """
     dist = np.sqrt((r.crs_x - r.tgt_x) ** 2 + (r.crs_y - r.tgt_y) ** 2)
     # If you are not in a blind trial
@@ -233,13 +271,16 @@ def check_target_reaching(r, timer_enter_tgt):
             timer_enter_tgt.start()
 
     # If blind trial -> stopping criterion is different
-    # (cursor has to remain in a specific region for 2000 ms (50 Hz -> count_mouse == 100)
+    # (cursor has to stay still for BLIND_HOLD_TIME: the time is accumulated, so it does not depend on the rate)
     else:
-        if (r.old_crs_x + 10 > r.crs_x > r.old_crs_x - 10 and
-                r.old_crs_y + 10 > r.crs_y > r.old_crs_y - 10 and r.at_home == 0):
+        max_step = BLIND_MAX_SPEED * dt / 1000
+        if (r.old_crs_x + max_step > r.crs_x > r.old_crs_x - max_step and
+                r.old_crs_y + max_step > r.crs_y > r.old_crs_y - max_step and r.at_home == 0):
             r.count_mouse += 1
+            r.still_time += dt
         else:
             r.count_mouse = 0
+            r.still_time = 0
 
     # Check here if the cursor is in the home target. In this case modify at_home to turn on/off the visual feedback
     # if the corresponding checkbox is selected
@@ -254,9 +295,10 @@ def check_target_reaching(r, timer_enter_tgt):
         else:
             r.at_home = 0
 
-def check_target_reaching_links(r, timer_enter_tgt):
+def check_target_reaching_links(r, timer_enter_tgt, dt=NOMINAL_TICK):
     """
     Check if cursor is inside the target
+    :param dt: time elapsed since the previous call [ms]
     """
     dist = np.sqrt((r.crs_anchor_x - r.tgt_x) ** 2 + (r.crs_anchor_y - r.tgt_y) ** 2)
     r.distance = dist
@@ -276,13 +318,16 @@ def check_target_reaching_links(r, timer_enter_tgt):
             timer_enter_tgt.start()
 
     # If blind trial -> stopping criterion is different
-    # (cursor has to remain in a specific region for 2000 ms (50 Hz -> count_mouse == 100)
+    # (cursor has to stay still for BLIND_HOLD_TIME: the time is accumulated, so it does not depend on the rate)
     else:
-        if (r.old_crs_x + 10 > r.crs_anchor_x > r.old_crs_x - 10 and
-                r.old_crs_y + 10 > r.crs_anchor_y > r.old_crs_y - 10 and r.at_home == 0):
+        max_step = BLIND_MAX_SPEED * dt / 1000
+        if (r.old_crs_x + max_step > r.crs_anchor_x > r.old_crs_x - max_step and
+                r.old_crs_y + max_step > r.crs_anchor_y > r.old_crs_y - max_step and r.at_home == 0):
             r.count_mouse += 1
+            r.still_time += dt
         else:
             r.count_mouse = 0
+            r.still_time = 0
 
     # Check here if the cursor is in the home target. In this case modify at_home to turn on/off the visual feedback
     # if the corresponding checkbox is selected
@@ -303,15 +348,17 @@ def check_time_reaching(r, timer_enter_tgt, timer_start_trial, timer_practice):
         # change status(OUT OF target, OUT OF TIME) -> cursor red
         if timer_start_trial.elapsed_time > 1000:
             r.state = 1
-    # BLIND TRIAL: cursor must stay in a specific region(+-50 pxl) for 100 ticks(100 * 20ms = 2000ms)
-    if r.is_blind == 1 and r.count_mouse == 100:
+    # BLIND TRIAL: cursor must stay still for BLIND_HOLD_TIME ms (see check_target_reaching)
+    if r.is_blind == 1 and r.still_time >= BLIND_HOLD_TIME:
         r.is_blind = 0
+        r.still_time = 0
 
     # VISUAL FEEDBACK ON: cursor must stay inside the target for 250 ms.
     if r.is_blind == 0 and r.state == 2 and timer_enter_tgt.elapsed_time > 250:
         # timer_enter_tgt.reset()  # Stops time interval measurement and resets the elapsed time to zero.
         timer_enter_tgt.start()
         r.count_mouse = 0
+        r.still_time = 0
         r.state = 0  # a new reaching will begin.state back to 0 (OUT OF target, IN TIME) -> cursor green
 
 
@@ -401,9 +448,10 @@ def check_time_reaching_links(r, timer_enter_tgt, timer_start_trial, timer_pract
         # change status(OUT OF target, OUT OF TIME) -> cursor red
         if timer_start_trial.elapsed_time > 1000:
             r.state = 1
-    # BLIND TRIAL: cursor must stay in a specific region(+-50 pxl) for 100 ticks(100 * 20ms = 2000ms)
-    if r.is_blind == 1 and r.count_mouse == 100:
+    # BLIND TRIAL: cursor must stay still for BLIND_HOLD_TIME ms (see check_target_reaching_links)
+    if r.is_blind == 1 and r.still_time >= BLIND_HOLD_TIME:
         r.is_blind = 0
+        r.still_time = 0
 
     # VISUAL FEEDBACK ON: cursor must stay inside the target for 250 ms or if time has gone over 10 secs
     if timer_start_trial.elapsed_time > 10000 and r.comeback == 0:
@@ -415,6 +463,7 @@ def check_time_reaching_links(r, timer_enter_tgt, timer_start_trial, timer_pract
         # timer_enter_tgt.reset()  # Stops time interval measurement and resets the elapsed time to zero.
         timer_enter_tgt.start()
         r.count_mouse = 0
+        r.still_time = 0
         r.epoch += 1
         r.state = 0  # a new reaching will begin.state back to 0 (OUT OF target, IN TIME) -> cursor green
 
@@ -509,6 +558,10 @@ def filt(N, fc, fs, btype, signal):
         :param signal: input signal to be filtered
         :return: filtered signal
     """
+    # imported here: scipy and pandas are slow to import and only needed for offline filtering
+    import pandas as pd
+    from scipy import signal as sgn
+
     Wn = fc / (fs / 2)
     b, a = sgn.butter(N, Wn, btype)
 
@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+
+# headless: SDL renders into an offscreen surface, no monitor or GPU needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pandas as pd
+import pygame
+
+from reaching import Reaching
+import reaching_functions
+import kinematics
+import rendering
+from rendering import DirtyRectRenderer, RenderCache
+
+RESOLUTIONS = ((1920, 1080), (3840, 2160))
+
+
+def synthetic_theta(n, seed=0, max_velocity=5):
+    """
+    link angles of a random smooth movement of the arm
+    :param n: number of frames
+    :param seed: seed of the random generator
+    :param max_velocity: limit of the angular velocity [deg/frame], as in start_reaching
+    :return: array (n x 3) [deg]
+    """
+    rng = np.random.default_rng(seed)
+    omega = np.cumsum(rng.normal(0, 0.5, (n, 3)), axis=0)
+    omega = np.clip(omega, -max_velocity, max_velocity)
+    return kinematics.wrap_angles(np.cumsum(omega, axis=0))
+
+
+def logged_theta(path):
+    """
+    link angles logged during practice
+    :param path: ResultsLogDay*.txt
+    :return: array (n x 3) [deg]
+    """
+    log = pd.read_csv(path, sep='\t', header=0)
+    return log[["theta1", "theta2", "theta3"]].values
+
+
+def run_benchmark(theta, width, height, scene='reaching', vision='CompleteVision', dirty=True):
+    """
+    draw one frame per row of theta as fast as possible and time the drawing and the display update
+    :param theta: link angles (n x 3) [deg]
+    :param width: width of the window [px]
+    :param height: height of the window [px]
+    :param scene: 'reaching' (practice GUI) or 'customization'
+    :param vision: 'CompleteVision' or 'MinimalVision'
+    :param dirty: update only the dirty rectangles (False: fill and flip the whole window at every frame)
+    :return: draw times [ms], display update times [ms]
+    """
+    r = Reaching(width, height)
+    reaching_functions.initialize_targets(r)
+    screen = pygame.display.set_mode((width, height))
+    renderer = DirtyRectRenderer(screen)
+    render_cache = RenderCache()
+    base = kinematics.arm_base(width, height)
+    joints_pos = np.empty((4, 2))
+
+    n = theta.shape[0]
+    draw_ms = np.zeros((n,))
+    flip_ms = np.zeros((n,))
+    for t in range(n):
+        # go through the targets and the states of the trial so that every sprite is used
+        r.trial = 1 + (t // 100) % len(r.list_tgt)
+        r.comeback = (t // 50) % 2
+        r.state = (t // 25) % 3
+        reaching_functions.set_target_reaching(r)
+
+        start = time.perf_counter()
+        if not dirty:
+            renderer.invalidate()
+        renderer.begin()
+        kinematics.forward_kinematics(theta[t], r.link_length, base, out=joints_pos)
+        anchors = joints_pos.tolist()
+        render_cache.update(r)
+        if scene == 'reaching':
+            renderer.add(rendering.draw_reaching_frame(screen, r, anchors, vision, "1", render_cache))
+        else:
+            renderer.add(rendering.draw_customization_frame(screen, r, anchors, vision, theta[t], render_cache))
+        drawn = time.perf_counter()
+        renderer.end()
+        flip_ms[t] = (time.perf_counter() - drawn) * 1000
+        draw_ms[t] = (drawn - start) * 1000
+
+    return draw_ms, flip_ms
+
+
+def format_results(name, draw_ms, flip_ms):
+    total = draw_ms + flip_ms
+    return name + "\t" + "\t".join("{:.3f}".format(v) for v in
+                                   (np.mean(draw_ms), np.percentile(draw_ms, 95), np.mean(flip_ms),
+                                    np.percentile(flip_ms, 95), 1000 / np.mean(total)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless benchmark of the reaching GUI drawing")
+    parser.add_argument("--frames", type=int, default=2000, help="number of frames of the synthetic trajectory")
+    parser.add_argument("--log", help="ResultsLogDay*.txt whose theta1..3 are replayed instead")
+    parser.add_argument("--scene", default="reaching", choices=["reaching", "customization"])
+    parser.add_argument("--vision", default="CompleteVision", choices=["CompleteVision", "MinimalVision"])
+    args = parser.parse_args()
+
+    theta = logged_theta(args.log) if args.log else synthetic_theta(args.frames)
+
+    pygame.init()
+    print("resolution\tmode\tdraw_ms\tdraw_p95_ms\tflip_ms\tflip_p95_ms\tfps")
+    for width, height in RESOLUTIONS:
+        for dirty in (False, True):
+            draw_ms, flip_ms = run_benchmark(theta, width, height, args.scene, args.vision, dirty)
+            name = str(width) + "x" + str(height) + "\t" + ("dirty" if dirty else "full")
+            print(format_results(name, draw_ms, flip_ms))
+    pygame.quit()
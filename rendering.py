@@ -0,0 +1,314 @@
+import pygame
+
+# Define some colors
+BLACK = (0, 0, 0)
+GREY = (0.50 * 255, 0.50 * 255, 0.50 * 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+YELLOW = (255, 255, 0)
+CURSOR = (0.19 * 255, 0.65 * 255, 0.4 * 255)
+
+
+class RenderCache:
+    """
+    Class that keeps the surfaces reused at every frame: the font, the glyphs of the characters of the numeric HUD
+    and the sprites of the circles (cursor, joints, targets, holograms) for each color.
+    A frame is then composed by blitting cached surfaces instead of rasterizing circles and text from scratch.
+    Everything is rebuilt when the size of the window or the radii of cursor and targets change
+    """
+
+    def __init__(self, font_size=50, glyphs="0123456789.-"):
+        """
+        :param font_size: size of the HUD font
+        :param glyphs: characters pre-rendered for each color (others are rendered the first time they are used)
+        """
+        self._font_size = font_size
+        self._preload = glyphs
+        self._key = None
+        self._font = None
+        self._glyphs = {}
+        self._glyph_colors = set()
+        self._sprites = {}
+
+    @property
+    def font(self):
+        if self._font is None:
+            self._font = pygame.font.Font(None, self._font_size)
+        return self._font
+
+    def update(self, r):
+        """
+        drop the cached surfaces if the geometry of the GUI changed since the last call
+        :param r: object of Reaching class
+        :return: True if the cache was cleared
+        """
+        key = (r.width, r.height, r.crs_radius, r.tgt_radius)
+        if key == self._key:
+            return False
+        self._key = key
+        self._sprites.clear()
+        return True
+
+    def clear(self):
+        self._key = None
+        self._font = None
+        self._glyphs.clear()
+        self._glyph_colors.clear()
+        self._sprites.clear()
+
+    def circle_sprite(self, color, radius, width=0):
+        """
+        :param color: color of the circle
+        :param radius: radius of the circle [px]
+        :param width: 0 for a filled circle, thickness of the border otherwise
+        :return: surface with the circle centered, transparent (colorkey) background
+        """
+        key = (color, radius, width)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            half = int(radius) + 1
+            sprite = pygame.Surface((2 * half + 1, 2 * half + 1))
+            sprite.fill(BLACK)
+            pygame.draw.circle(sprite, color, (half, half), radius, width)
+            sprite.set_colorkey(BLACK, pygame.RLEACCEL)
+            self._sprites[key] = sprite
+        return sprite
+
+    def blit_circle(self, surface, color, center, radius, width=0):
+        """
+        draw a circle by blitting its sprite
+        :return: rect touched
+        """
+        sprite = self.circle_sprite(color, radius, width)
+        half = sprite.get_width() // 2
+        return surface.blit(sprite, (int(center[0]) - half, int(center[1]) - half))
+
+    def glyph(self, char, color):
+        """
+        :return: surface with a single character rendered with the HUD font
+        """
+        key = (char, color)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            if color not in self._glyph_colors:
+                # first use of this color: render the whole preloaded set at once
+                self._glyph_colors.add(color)
+                for c in self._preload:
+                    self._glyphs[(c, color)] = self.font.render(c, True, color)
+                glyph = self._glyphs.get(key)
+            if glyph is None:
+                glyph = self.font.render(char, True, color)
+                self._glyphs[key] = glyph
+        return glyph
+
+    def blit_text(self, surface, text, color, pos):
+        """
+        draw a string by blitting the glyph of each character
+        :return: rect touched
+        """
+        x, y = pos
+        height = 0
+        for char in text:
+            glyph = self.glyph(char, color)
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+            height = max(height, glyph.get_height())
+        return pygame.Rect(pos[0], y, x - pos[0], height)
+
+
+class DirtyRectRenderer:
+    """
+    Class that updates only the parts of the window that changed since the previous frame.
+    The drawing functions return the rects they touched: at the next frame those rects are cleared, and the display
+    is updated with the union of the old and the new rects instead of flipping the whole window.
+    A full fill and flip is done on the first frame and after invalidate() (resize, new block, window exposed)
+    """
+
+    def __init__(self, screen, background=BLACK):
+        """
+        :param screen: display surface (pygame.display.set_mode)
+        :param background: color of the background
+        """
+        self._screen = screen
+        self._background = background
+        self._prev_rects = []
+        self._rects = []
+        self._full = True
+        self._full_frames = 0
+        self._frames = 0
+
+    @property
+    def screen(self):
+        return self._screen
+
+    @screen.setter
+    def screen(self, value):
+        self._screen = value
+        self.invalidate()
+
+    @property
+    def frames(self):
+        return self._frames
+
+    @property
+    def full_frames(self):
+        """number of frames that required a full flip"""
+        return self._full_frames
+
+    def invalidate(self):
+        """
+        redraw and flip the whole window at the next frame
+        :return:
+        """
+        self._full = True
+
+    def begin(self):
+        """
+        clear what was drawn in the previous frame
+        :return: surface to draw on
+        """
+        if self._full:
+            self._screen.fill(self._background)
+        else:
+            for rect in self._prev_rects:
+                self._screen.fill(self._background, rect)
+        self._rects = []
+        return self._screen
+
+    def add(self, rects):
+        """
+        :param rects: rects touched by the drawing of this frame (as returned by pygame.draw and blit)
+        :return:
+        """
+        self._rects.extend(rects)
+
+    def end(self):
+        """
+        show the frame, updating only the rects cleared and drawn since begin()
+        :return:
+        """
+        if self._full:
+            pygame.display.flip()
+            self._full = False
+            self._full_frames += 1
+        else:
+            pygame.display.update(self._prev_rects + self._rects)
+        self._prev_rects = self._rects
+        self._frames += 1
+
+
+def draw_links(surface, r, anchors, cache):
+    """
+    draw the links, the joints and the cursor of the arm
+    :param surface: surface to draw on
+    :param r: object of Reaching class
+    :param anchors: positions of base, joints and cursor (see kinematics.forward_kinematics)
+    :param cache: RenderCache with the sprites of the joints and of the cursor
+    :return: list of rects touched
+    """
+    link1_anchor, link2_anchor, link3_anchor, crs_anchor = anchors
+    return [pygame.draw.line(surface, GREY, link1_anchor, link2_anchor, 4),
+            pygame.draw.line(surface, GREY, link2_anchor, link3_anchor, 4),
+            pygame.draw.line(surface, GREY, link3_anchor, crs_anchor, 4),
+            # Drawing the joints
+            cache.blit_circle(surface, RED, link1_anchor, r.crs_radius),
+            cache.blit_circle(surface, RED, link2_anchor, r.crs_radius),
+            cache.blit_circle(surface, RED, link3_anchor, r.crs_radius),
+            cache.blit_circle(surface, CURSOR, crs_anchor, r.crs_radius * 1.25)]
+
+
+def draw_cursor(surface, r, anchors, cache):
+    """
+    draw only the cursor (end of the arm)
+    :return: list of rects touched
+    """
+    return [cache.blit_circle(surface, CURSOR, anchors[-1], r.crs_radius * 1.25)]
+
+
+def draw_reaching_frame(surface, r, anchors, vision, day, cache):
+    """
+    draw the practice GUI: arm (or only the cursor, depending on vision and day) and current target
+    :param surface: surface to draw on
+    :param r: object of Reaching class
+    :param anchors: positions of base, joints and cursor
+    :param vision: 'CompleteVision' or 'MinimalVision'
+    :param day: day of practice (on day 4 the two conditions are switched)
+    :param cache: RenderCache with the sprites of cursor, joints and targets
+    :return: list of rects touched
+    """
+    rects = []
+    crs_anchor = anchors[-1]
+
+    # Do not show the cursor in the blind trials when the cursor is outside the home target
+    if not r.is_blind:
+        # Switching conditions on day 4
+        if day == "4" and vision == 'CompleteVision':
+            rects += draw_cursor(surface, r, anchors, cache)
+        elif day == "4" and vision == 'MinimalVision':
+            rects += draw_links(surface, r, anchors, cache)
+        elif vision == 'CompleteVision':
+            rects += draw_links(surface, r, anchors, cache)
+        elif vision == 'MinimalVision':
+            rects += draw_cursor(surface, r, anchors, cache)
+
+    # draw target. green if blind, state 0 or 1. yellow if notBlind and state 2
+    tgt = (int(r.tgt_x), int(r.tgt_y))
+    if r.state == 0 or r.state == 1 or (r.state == 2 and r.is_blind):
+        rects.append(cache.blit_circle(surface, GREEN, tgt, r.tgt_radius, 2))
+    elif r.state == 2:
+        rects.append(cache.blit_circle(surface, YELLOW, tgt, r.tgt_radius, 2))
+
+    # Drawing a hologram of the cursor if outside the boundaries
+    if crs_anchor[1] > r.height:
+        rects.append(cache.blit_circle(surface, GREY, (crs_anchor[0], r.height), r.crs_radius * 1.25, 2))
+
+    return rects
+
+
+def draw_customization_frame(surface, r, anchors, vision, link_rot, cache):
+    """
+    draw the customization GUI: arm, holograms of the cursor, the 8 test targets, score and debugging values
+    :param surface: surface to draw on
+    :param r: object of Reaching class
+    :param anchors: positions of base, joints and cursor
+    :param vision: 'CompleteVision' or 'MinimalVision'
+    :param link_rot: current angles of the links [deg]
+    :param cache: RenderCache with the sprites and the glyphs of the HUD
+    :return: list of rects touched
+    """
+    rects = []
+    crs_anchor = anchors[-1]
+
+    if vision == 'CompleteVision':
+        rects += draw_links(surface, r, anchors, cache)
+    elif vision == 'MinimalVision':
+        rects += draw_cursor(surface, r, anchors, cache)
+
+    # Drawing a hologram of the cursor if currently outside the window boundaries
+    if crs_anchor[1] > r.height:
+        rects.append(cache.blit_circle(surface, GREY, (crs_anchor[0], r.height), r.crs_radius * 1.25, 2))
+    if crs_anchor[1] < 0:
+        rects.append(cache.blit_circle(surface, GREY, (crs_anchor[0], 0), r.crs_radius * 1.25, 2))
+    if crs_anchor[0] > r.width:
+        rects.append(cache.blit_circle(surface, GREY, (r.width, crs_anchor[1]), r.crs_radius * 1.25, 2))
+    if crs_anchor[0] < 0:
+        rects.append(cache.blit_circle(surface, GREY, (0, crs_anchor[1]), r.crs_radius * 1.25, 2))
+
+    # draw each test target
+    for i in range(8):
+        tgt_x = r.tgt_x_list[r.list_tgt[i]]
+        tgt_y = r.tgt_y_list[r.list_tgt[i]]
+        rects.append(cache.blit_circle(surface, GREEN, (int(tgt_x), int(tgt_y)), r.tgt_radius, 2))
+
+    # Display scores:
+    rects.append(cache.blit_text(surface, str(r.score), RED, (1250, 10)))
+
+    # Debugging purposes. Displaying information online
+    hud = ["{:.3f}".format(r.crs_x), "{:.3f}".format(r.crs_y), "{:.3f}".format(r.crs_z),
+           "{:.3f}".format(link_rot[0]), "{:.3f}".format(link_rot[1]), "{:.3f}".format(link_rot[2])]
+    for k, text in enumerate(hud):
+        rects.append(cache.blit_text(surface, text, RED, (15, 10 + 50 * k)))
+    rects.append(cache.blit_text(surface, str(r.crs_anchor_x), GREEN, (15, 310)))
+    rects.append(cache.blit_text(surface, str(r.crs_anchor_y), GREEN, (15, 320)))
+
+    return rects
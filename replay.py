@@ -0,0 +1,146 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from bomi_map import BomiMap, load_bomi_map, load_transform
+from control import MAX_ANGLE_VELOCITY, MIN_ANGLE_VELOCITY
+from reaching import Reaching
+from stopwatch import SimulatedClock, SimulatedStopWatch
+import reaching_functions
+import kinematics
+
+
+
+def read_session(path):
+    """
+    read the body landmarks (and time, if available) of a recorded session
+    :param path: ResultsLogDay*.txt (tab separated, with header), Calib.npz or Calib.txt (space separated, no header)
+    :return: body landmarks (N x n_joints), time of each row [ms] or None
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            body = data['body']
+            timestamp = data['timestamp']
+        return body, (timestamp - timestamp[0]) * 1000 if timestamp.size else None
+    if os.path.basename(path).startswith('Calib'):
+        body = pd.read_csv(path, sep=' ', header=None).values
+        return body, None
+
+    log = pd.read_csv(path, sep='\t', header=0).values
+    body = log[:, 2:log.shape[1] - reaching_functions.N_LOG_TAIL]
+    return body, log[:, 0]
+
+
+def replay_session(body, bomi_map, dt=20, time=None, r=None):
+    """
+    simulate a practice session on recorded body landmarks, several hundred times faster than real time.
+    The landmarks are pushed in bulk through the map, the link kinematics are integrated as in start_reaching and
+    the reaching state machine is stepped on a simulated clock
+    :param body: body landmarks (N x n_joints)
+    :param bomi_map: object of BomiMap (training + customization transforms included)
+    :param dt: tick duration [ms], used when time is None
+    :param time: optional time of each sample [ms] (e.g. the time column of a ResultsLogDay file)
+    :param r: optional object of Reaching class (a new one is created otherwise)
+    :return: array with the same columns as the ResultsLogDay file, object of Reaching class at the end
+    """
+    if r is None:
+        r = Reaching()
+    n = body.shape[0]
+
+    # angular velocities for the whole session in one call, clipped as in start_reaching
+    omega = np.clip(bomi_map.transform(body), MIN_ANGLE_VELOCITY, MAX_ANGLE_VELOCITY)
+
+    # link angles after each tick, and the cursor anchor drawn at each tick (computed before the increment)
+    theta = kinematics.wrap_angles(np.cumsum(omega, axis=0))
+    theta_drawn = np.vstack((np.zeros((1, theta.shape[1])), theta[:-1]))
+    anchor = kinematics.end_effector(theta_drawn, r.link_length, kinematics.arm_base(r.width, r.height))
+    anchor_x = anchor[:, 0]
+    anchor_y = anchor[:, 1]
+
+    # simulated clock drives the same timers used by the state machine
+    if time is None:
+        time = np.arange(1, n + 1) * dt
+    clock = SimulatedClock(time[0] - dt)
+    timer_enter_tgt = SimulatedStopWatch(clock)
+    timer_start_trial = SimulatedStopWatch(clock)
+    timer_practice = SimulatedStopWatch(clock)
+
+    reaching_functions.initialize_targets(r)
+    timer_practice.start()
+
+    state = np.zeros((n, 8))
+    log_time = np.zeros((n, 2))
+    for t in range(n):
+        clock.time = time[t]
+
+        r.old_crs_x = r.crs_anchor_x
+        r.old_crs_y = r.crs_anchor_y
+        r.crs_x, r.crs_y, r.crs_z = omega[t]
+        r.crs_anchor_x = anchor_x[t]
+        r.crs_anchor_y = anchor_y[t]
+
+        reaching_functions.set_target_reaching(r)
+        r.theta1, r.theta2, r.theta3 = theta[t, :3]
+
+        reaching_functions.check_target_reaching_links(r, timer_enter_tgt, time[t] - time[t - 1] if t > 0 else dt)
+        reaching_functions.check_time_reaching_links(r, timer_enter_tgt, timer_start_trial, timer_practice)
+
+        log_time[t] = timer_practice.elapsed_time, r.reach_time
+        state[t] = r.target, r.trial, r.state, r.comeback, r.at_home, r.score, r.distance, r.epoch
+
+    log = np.hstack((log_time, body, theta[:, :3], omega[:, :3], anchor_x[:, None], anchor_y[:, None], state))
+    return log, r
+
+
+def replay_files(session_path, dr_mode, drPath, scale_custom=None, off_custom=None, dt=20):
+    """
+    replay a recorded session through the map saved in drPath
+    :param session_path: ResultsLogDay*.txt, Calib.npz or Calib.txt
+    :param dr_mode: 'pca' or 'ae'
+    :param drPath: path where the BoMI forward map and the scaling values are saved
+    :param scale_custom: customization gains to use instead of the saved ones
+    :param off_custom: customization offsets to use instead of the saved ones
+    :param dt: tick duration [ms] when the session file has no time column
+    :return: array with the same columns as the ResultsLogDay file
+    """
+    body, time = read_session(session_path)
+
+    _, scale_dr, off_dr = load_transform(drPath, 'dr')
+    _, saved_scale, saved_off = load_transform(drPath, 'custom')
+    if scale_custom is None:
+        scale_custom = saved_scale
+    if off_custom is None:
+        off_custom = saved_off
+    bomi_map = BomiMap(load_bomi_map(dr_mode, drPath), [(None, scale_dr, off_dr), (None, scale_custom, off_custom)])
+
+    log, _ = replay_session(body, bomi_map, dt=dt, time=time)
+    return log
+
+
+def write_replay_log(path, log, columns=None):
+    """
+    save a replayed session with the header of the ResultsLogDay file
+    :param path: output file
+    :param log: array returned by replay_session
+    :param columns: column names. Defaults to reaching_functions.LOG_COLUMNS
+    :return:
+    """
+    if columns is None:
+        columns = reaching_functions.LOG_COLUMNS
+    np.savetxt(path, log, fmt='%.10g', delimiter='\t', header='\t'.join(columns), comments='')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded session through a BoMI forward map")
+    parser.add_argument("session", help="ResultsLogDay*.txt, Calib.npz or Calib.txt")
+    parser.add_argument("drPath", help="folder with the BoMI forward map (e.g. .../calib/PCA/)")
+    parser.add_argument("--mode", default="pca", choices=["pca", "ae"])
+    parser.add_argument("--dt", type=float, default=20, help="tick duration [ms] when the session has no time")
+    parser.add_argument("--out", default="ReplayLog.txt")
+    args = parser.parse_args()
+
+    replayed = replay_files(args.session, args.mode, os.path.join(args.drPath, ''), dt=args.dt)
+    write_replay_log(args.out, replayed)
+    print("Replayed " + str(len(replayed)) + " samples into " + args.out)
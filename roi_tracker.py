@@ -0,0 +1,156 @@
+import numpy as np
+
+from lazy_modules import LazyModule
+
+cv2 = LazyModule('cv2')
+
+
+class HandRoiTracker:
+    """
+    Class that runs MediaPipe Hands on a crop of the frame around the hand found in the previous frames instead of
+    on the whole frame. The crop is the bounding box of the last landmarks expanded by a margin, optionally
+    downsampled; the landmarks found in the crop are remapped in place to normalized coordinates of the full frame,
+    so the body vector has the same meaning as without tracking.
+    The region is kept still while the hand stays well inside it (MediaPipe's own tracking between frames works in
+    the coordinates of its input image) and moved only when the hand gets close to its border or changes size.
+    When no hand is found in the crop, the same frame is searched again in full and tracking restarts from there
+    """
+
+    def __init__(self, margin=0.6, min_size=128, scale=1.0, quantum=32):
+        """
+        :param margin: the crop is the landmark bounding box enlarged by margin times its size on each side
+        :param min_size: minimum side of the crop [px]
+        :param scale: downsampling of the crop before inference (1: none, 0.5: half width and height)
+        :param quantum: crop sides are rounded up to multiples of quantum px, so few different sizes occur
+        """
+        self._margin = margin
+        self._min_size = min_size
+        self._scale = scale
+        self._quantum = quantum
+        self._roi = None  # x0, y0, x1, y1 [px]
+        self._tracked = 0
+        self._searches = 0
+        self._lost = 0
+
+    @property
+    def roi(self):
+        """current crop (x0, y0, x1, y1) [px], None if the next frame will be searched in full"""
+        return self._roi
+
+    @property
+    def tracked(self):
+        """number of frames where the hand was found in the crop"""
+        return self._tracked
+
+    @property
+    def searches(self):
+        """number of full-frame searches"""
+        return self._searches
+
+    @property
+    def lost(self):
+        """number of times the hand was lost in the crop"""
+        return self._lost
+
+    def reset(self):
+        self._roi = None
+
+    def _fit_roi(self, landmark, width, height):
+        """
+        :return: crop (x0, y0, x1, y1) [px] around the landmarks (normalized to the full frame)
+        """
+        xs = [lm.x for lm in landmark]
+        ys = [lm.y for lm in landmark]
+        bx0, bx1 = min(xs) * width, max(xs) * width
+        by0, by1 = min(ys) * height, max(ys) * height
+
+        # square crop, so the aspect of the hand is the same at any position
+        side = max(bx1 - bx0, by1 - by0) * (1 + 2 * self._margin)
+        side = max(side, self._min_size)
+        side = int(np.ceil(side / self._quantum) * self._quantum)
+        side_x = min(side, width)
+        side_y = min(side, height)
+        cx = (bx0 + bx1) / 2
+        cy = (by0 + by1) / 2
+        x0 = int(min(max(cx - side_x / 2, 0), width - side_x))
+        y0 = int(min(max(cy - side_y / 2, 0), height - side_y))
+        return x0, y0, x0 + side_x, y0 + side_y
+
+    def _keep_roi(self, landmark, width, height):
+        """
+        :return: True if the hand is still well inside the current crop and fills a reasonable part of it
+        """
+        x0, y0, x1, y1 = self._roi
+        xs = [lm.x * width for lm in landmark]
+        ys = [lm.y * height for lm in landmark]
+        bw = max(xs) - min(xs)
+        bh = max(ys) - min(ys)
+        # half of the margin must be left on every side
+        pad = max(bw, bh) * self._margin / 2
+        inside = min(xs) - pad >= x0 and max(xs) + pad <= x1 and min(ys) - pad >= y0 and max(ys) + pad <= y1
+        side = x1 - x0
+        too_big = max(bw, bh) * (1 + 2 * self._margin) < side / 2 and side > self._min_size
+        return inside and not too_big
+
+    def _crop(self, image, preprocessor):
+        x0, y0, x1, y1 = self._roi
+        crop = image[y0:y1, x0:x1]
+        size = None
+        if self._scale != 1.0:
+            size = (max(int((x1 - x0) * self._scale), 1), max(int((y1 - y0) * self._scale), 1))
+        if preprocessor is not None:
+            # converted straight from the view of the frame into a reused buffer (crop sides are quantized)
+            return preprocessor.convert(crop, size)
+        if size is not None:
+            return cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        # MediaPipe needs a contiguous image
+        return np.ascontiguousarray(crop)
+
+    def _remap(self, results, width, height):
+        """
+        express the landmarks found in the crop in normalized coordinates of the full frame (in place)
+        :return:
+        """
+        x0, y0, x1, y1 = self._roi
+        sx = (x1 - x0) / width
+        sy = (y1 - y0) / height
+        ox = x0 / width
+        oy = y0 / height
+        for hand in results.multi_hand_landmarks:
+            for lm in hand.landmark:
+                lm.x = ox + lm.x * sx
+                lm.y = oy + lm.y * sy
+                # z has the scale of x
+                lm.z = lm.z * sx
+
+    def process(self, hands, image, preprocessor=None):
+        """
+        run hand landmark estimation on a frame
+        :param hands: object of mp.solutions.hands.Hands
+        :param image: RGB frame (height x width x 3), or BGR frame if a preprocessor is given
+        :param preprocessor: optional FramePreprocessor that converts only the crop to RGB (landmarks are not mirrored)
+        :return: results of hands.process, with landmarks normalized to the full frame
+        """
+        height, width = image.shape[:2]
+        if self._roi is not None:
+            results = hands.process(self._crop(image, preprocessor))
+            if results.multi_hand_landmarks:
+                self._remap(results, width, height)
+                self._tracked += 1
+                landmark = results.multi_hand_landmarks[0].landmark
+                if not self._keep_roi(landmark, width, height):
+                    self._roi = self._fit_roi(landmark, width, height)
+                return results
+            # hand lost in the crop: search the same frame in full
+            self._lost += 1
+            self._roi = None
+
+        results = hands.process(image if preprocessor is None else preprocessor.convert(image))
+        self._searches += 1
+        if results.multi_hand_landmarks:
+            self._roi = self._fit_roi(results.multi_hand_landmarks[0].landmark, width, height)
+        return results
+
+    def stats(self):
+        return "tracked: " + str(self._tracked) + ", full searches: " + str(self._searches) + \
+               ", lost: " + str(self._lost)
@@ -0,0 +1,261 @@
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+# columns of the practice log that hold integer values (everything else is stored as float64)
+INT_COLUMNS = ("target", "trial", "state", "comeback", "at_home", "score", "reach", "frame_id", "detected",
+               "map_version")
+
+
+def log_dtype(columns, int_columns=INT_COLUMNS):
+    """
+    fixed-width record type of the binary session log: one field per column
+    :param columns: column names (e.g. reaching_functions.LOG_COLUMNS)
+    :param int_columns: names of the columns stored as int32
+    :return: numpy structured dtype
+    """
+    return np.dtype([(name, np.int32 if name in int_columns else np.float64) for name in columns])
+
+
+def schema_path(path):
+    """
+    :param path: binary session log
+    :return: path of the JSON file that describes its records
+    """
+    return path + ".json"
+
+
+class SessionLogWriter:
+    """
+    Class that appends fixed-width records to a memory-mapped binary file.
+    The file is preallocated in chunks of rows and grown when full, so that appending a row is a copy into the
+    mapping instead of formatting a text line and reopening the file. Column names, record layout and number of
+    valid rows are kept in a JSON file next to the log (see schema_path)
+    """
+
+    def __init__(self, path, columns, int_columns=INT_COLUMNS, chunk_rows=2 ** 16, flush_every=500, fsync=False):
+        """
+        :param path: binary log file (overwritten if it exists)
+        :param columns: column names, in the order used by append()
+        :param int_columns: names of the columns stored as int32
+        :param chunk_rows: number of rows preallocated each time the file grows
+        :param flush_every: rows between two flushes of the mapping to disk (0 to flush only on close)
+        :param fsync: call os.fsync after each flush (survives a power loss, slower)
+        """
+        self._path = path
+        self._columns = list(columns)
+        self._dtype = log_dtype(self._columns, int_columns)
+        self._chunk_rows = chunk_rows
+        self._flush_every = flush_every
+        self._fsync = fsync
+        self._rows = 0
+        self._unflushed = 0
+
+        self._file = open(path, "w+b")
+        self._capacity = 0
+        self._mm = None
+        self._grow()
+        self._write_schema()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def rows(self):
+        return self._rows
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def _grow(self):
+        if self._mm is not None:
+            self._mm.flush()
+            del self._mm
+        self._capacity += self._chunk_rows
+        self._file.truncate(self._capacity * self._dtype.itemsize)
+        self._mm = np.memmap(self._file, dtype=self._dtype, mode="r+", shape=(self._capacity,))
+
+    def _write_schema(self):
+        schema = {"columns": self._columns,
+                  "formats": [self._dtype[name].str for name in self._columns],
+                  "rows": self._rows}
+        tmp = schema_path(self._path) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(schema, f)
+        os.replace(tmp, schema_path(self._path))
+
+    def append(self, values):
+        """
+        write one record
+        :param values: tuple with one value per column
+        :return:
+        """
+        if self._rows == self._capacity:
+            self._grow()
+        self._mm[self._rows] = values
+        self._rows += 1
+        self._unflushed += 1
+        if self._flush_every and self._unflushed >= self._flush_every:
+            self.flush()
+
+    def extend(self, records):
+        """
+        write several records at once
+        :param records: structured array with dtype self.dtype (or anything convertible to it)
+        :return:
+        """
+        records = np.asarray(records, dtype=self._dtype)
+        while self._rows + len(records) > self._capacity:
+            self._grow()
+        self._mm[self._rows:self._rows + len(records)] = records
+        self._rows += len(records)
+        self._unflushed += len(records)
+        if self._flush_every and self._unflushed >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        """
+        write the mapped pages and the number of valid rows to disk
+        :return:
+        """
+        self._mm.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+        self._write_schema()
+        self._unflushed = 0
+
+    def close(self):
+        """
+        flush, trim the preallocated rows that were not used and close the file
+        :return:
+        """
+        if self._file is None:
+            return
+        self.flush()
+        del self._mm
+        self._mm = None
+        self._file.truncate(self._rows * self._dtype.itemsize)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SessionLogQueue:
+    """
+    Class that hands log records from the control loop to the thread that writes them to disk.
+    The control loop pushes one record per tick and the writer thread drains whatever is queued in batches.
+    deque.append and deque.popleft are atomic, so neither side takes a lock and the control loop never waits
+    for the disk
+    """
+
+    def __init__(self, dtype, batch_rows=256):
+        """
+        :param dtype: record type of the log (see log_dtype)
+        :param batch_rows: maximum number of records handed to the writer in one call
+        """
+        self._records = deque()
+        self._batch = np.zeros((batch_rows,), dtype=dtype)
+        self._pushed = 0
+        self._written = 0
+
+    @property
+    def pushed(self):
+        return self._pushed
+
+    @property
+    def written(self):
+        return self._written
+
+    @property
+    def pending(self):
+        return len(self._records)
+
+    def push(self, record):
+        """
+        queue one record. Only the control loop may call it
+        :param record: tuple with one value per column
+        :return:
+        """
+        self._records.append(record)
+        self._pushed += 1
+
+    def drain(self, writer):
+        """
+        move every queued record into the log. Only the writer thread may call it
+        :param writer: object of SessionLogWriter with the same record type
+        :return: number of records written
+        """
+        n = 0
+        count = 0
+        while self._records:
+            self._batch[n] = self._records.popleft()
+            n += 1
+            if n == len(self._batch):
+                writer.extend(self._batch)
+                count += n
+                n = 0
+        if n:
+            writer.extend(self._batch[:n])
+            count += n
+        self._written += count
+        return count
+
+
+def read_session_log(path):
+    """
+    load a binary session log
+    :param path: binary log file written by SessionLogWriter
+    :return: structured array with one field per column (only the rows flushed to disk)
+    """
+    with open(schema_path(path)) as f:
+        schema = json.load(f)
+    dtype = np.dtype(list(zip(schema["columns"], schema["formats"])))
+    return np.fromfile(path, dtype=dtype, count=schema["rows"])
+
+
+def to_tsv(path, tsv_path, columns=None):
+    """
+    convert a binary session log into the tab separated text file read by the analysis scripts
+    :param path: binary log file written by SessionLogWriter
+    :param tsv_path: output text file (e.g. ResultsLogDay1.txt)
+    :param columns: columns to write, in order. Defaults to every column of the log
+    :return: number of rows written
+    """
+    log = read_session_log(path)
+    if columns is None:
+        columns = log.dtype.names
+    fmt = ["%d" if log.dtype[name].kind == "i" else "%.17g" for name in columns]
+    table = log[list(columns)]
+    with open(tsv_path, "w") as f:
+        f.write("\t".join(columns) + "\n")
+        np.savetxt(f, table, fmt=fmt, delimiter="\t")
+    return len(log)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a binary session log into a tab separated text file")
+    parser.add_argument("log", help="binary log (e.g. ResultsLogDay1.bin)")
+    parser.add_argument("--out", help="output text file (defaults to the log name with .txt extension)")
+    args = parser.parse_args()
+
+    out = args.out if args.out else os.path.splitext(args.log)[0] + ".txt"
+    print("Converted " + str(to_tsv(args.log, out)) + " rows into " + out)
@@ -0,0 +1,340 @@
+import argparse
+import os
+import time
+from collections import deque
+from threading import Condition, Thread
+
+import numpy as np
+
+from lazy_modules import LazyModule
+
+cv2 = LazyModule('cv2')
+
+N_HAND_LANDMARKS = 21
+HANDEDNESS = ('Left', 'Right')
+
+
+class VideoRecorder:
+    """
+    Class that saves the raw webcam frames of a session without slowing down the capture thread.
+    record() only copies the frame into a pool of preallocated slots; a background thread encodes the frames to a
+    video file (or to JPEG images, in subdirectories of chunk_frames images). When the encoder falls behind and the
+    pool is full, the new frame is dropped and counted, so the memory used is bounded and the capture never waits.
+    The frame id and capture time of each encoded frame are saved in <path>_frames.npz
+    """
+
+    def __init__(self, path, fps=30.0, fourcc='MJPG', jpeg=False, max_pending=32, jpeg_quality=90,
+                 chunk_frames=1000):
+        """
+        :param path: output video file, or output directory if jpeg is True
+        :param fps: rate written in the header of the video file
+        :param fourcc: codec of the video file
+        :param jpeg: save one JPEG image per frame instead of a video file
+        :param max_pending: number of frames waiting to be encoded before new frames are dropped
+        :param jpeg_quality: quality of the JPEG images (0-100)
+        :param chunk_frames: number of images per subdirectory
+        """
+        self._path = path
+        self._fps = fps
+        self._fourcc = fourcc
+        self._jpeg = jpeg
+        self._jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self._chunk_frames = chunk_frames
+        self._max_pending = max_pending
+
+        # the pool is allocated at the first frame, when the size of the frames is known
+        self._pool = None
+        self._slot_id = np.zeros((max_pending,), dtype=np.int64)
+        self._slot_time = np.zeros((max_pending,), dtype=np.float64)
+        self._free = deque(range(max_pending))
+        self._ready = deque()
+        self._cond = Condition()
+        self._closed = False
+
+        self._writer = None
+        self._frame_id = []
+        self._timestamp = []
+        self._recorded = 0
+        self._dropped = 0
+
+        self._thread = Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def index_path(self):
+        return os.path.splitext(self._path.rstrip('/'))[0] + '_frames.npz'
+
+    @property
+    def recorded(self):
+        """number of frames accepted by record()"""
+        return self._recorded
+
+    @property
+    def dropped(self):
+        """number of frames dropped because the pool was full (or the frame size changed)"""
+        return self._dropped
+
+    @property
+    def written(self):
+        return len(self._frame_id)
+
+    @property
+    def pending(self):
+        return len(self._ready)
+
+    def record(self, frame, frame_id, timestamp=None):
+        """
+        queue a frame for encoding. Never blocks
+        :param frame: BGR frame (it is copied, the caller can reuse it right away)
+        :param frame_id: id of the frame (FrameBuffer.commit)
+        :param timestamp: capture time (time.perf_counter). Defaults to now
+        :return: True if the frame was queued, False if it was dropped
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        with self._cond:
+            if self._closed:
+                return False
+            if self._pool is None:
+                self._pool = np.empty((self._max_pending,) + frame.shape, dtype=frame.dtype)
+            if not self._free or frame.shape != self._pool.shape[1:]:
+                self._dropped += 1
+                return False
+            idx = self._free.popleft()
+        # the slot belongs to the producer until it is in the ready queue
+        np.copyto(self._pool[idx], frame)
+        self._slot_id[idx] = frame_id
+        self._slot_time[idx] = timestamp
+        with self._cond:
+            self._ready.append(idx)
+            self._recorded += 1
+            self._cond.notify()
+        return True
+
+    def _write(self, frame, frame_id):
+        if self._jpeg:
+            chunk = os.path.join(self._path, "{:06d}".format(len(self._frame_id) // self._chunk_frames))
+            if len(self._frame_id) % self._chunk_frames == 0:
+                os.makedirs(chunk, exist_ok=True)
+            cv2.imwrite(os.path.join(chunk, "{:08d}.jpg".format(frame_id)), frame, self._jpeg_params)
+        else:
+            if self._writer is None:
+                height, width = frame.shape[:2]
+                self._writer = cv2.VideoWriter(self._path, cv2.VideoWriter_fourcc(*self._fourcc), self._fps,
+                                               (width, height))
+            self._writer.write(frame)
+
+    def _encode(self):
+        """
+        function that runs in the encoder thread until close() and the queue is empty
+        :return:
+        """
+        while True:
+            with self._cond:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+                if not self._ready:
+                    break
+                idx = self._ready.popleft()
+            self._write(self._pool[idx], int(self._slot_id[idx]))
+            self._frame_id.append(int(self._slot_id[idx]))
+            self._timestamp.append(float(self._slot_time[idx]))
+            with self._cond:
+                self._free.append(idx)
+
+    def close(self):
+        """
+        encode the frames still queued, close the video file and save the frame index
+        :return:
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        if self._frame_id:
+            np.savez(self.index_path, frame_id=np.array(self._frame_id, dtype=np.int64),
+                     timestamp=np.array(self._timestamp, dtype=np.float64))
+        self._pool = None
+
+    def stats(self):
+        return "recorded: " + str(self._recorded) + ", written: " + str(self.written) + \
+               ", dropped: " + str(self._dropped)
+
+
+class LandmarkRecorder:
+    """
+    Class that keeps the full MediaPipe hand landmarks (21 x (x, y, z)), handedness and its score of every processed
+    frame, indexed by frame id, and saves them in a compressed npz file. Frames without a detected hand are kept
+    with nan landmarks, so the file tells which frames were processed and which were missed.
+    Storage is preallocated and doubled when full
+    """
+
+    def __init__(self, path, capacity=4096):
+        """
+        :param path: output npz file
+        :param capacity: number of frames preallocated
+        """
+        self._path = path
+        self._n = 0
+        self._frame_id = np.zeros((capacity,), dtype=np.int64)
+        self._timestamp = np.zeros((capacity,), dtype=np.float64)
+        self._landmarks = np.full((capacity, N_HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self._handedness = np.full((capacity,), -1, dtype=np.int8)
+        self._score = np.full((capacity,), np.nan, dtype=np.float32)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def frames(self):
+        return self._n
+
+    def _grow(self):
+        capacity = 2 * self._frame_id.shape[0]
+        for name, fill in (('_frame_id', 0), ('_timestamp', 0), ('_landmarks', np.nan), ('_handedness', -1),
+                           ('_score', np.nan)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def record(self, results, frame_id, timestamp):
+        """
+        :param results: output of hands.process()
+        :param frame_id: id of the processed frame
+        :param timestamp: capture time of the frame (time.perf_counter)
+        :return: True if a hand was detected
+        """
+        if self._n == self._frame_id.shape[0]:
+            self._grow()
+        k = self._n
+        self._n += 1
+        self._frame_id[k] = frame_id
+        self._timestamp[k] = timestamp
+
+        hand_landmarks = getattr(results, 'multi_hand_landmarks', None)
+        if not hand_landmarks:
+            return False
+        row = self._landmarks[k]
+        for i, lm in enumerate(hand_landmarks[0].landmark):
+            row[i, 0] = lm.x
+            row[i, 1] = lm.y
+            row[i, 2] = lm.z
+        handedness = getattr(results, 'multi_handedness', None)
+        if handedness:
+            classification = handedness[0].classification[0]
+            self._handedness[k] = HANDEDNESS.index(classification.label) if classification.label in HANDEDNESS \
+                else -1
+            self._score[k] = classification.score
+        return True
+
+    def save(self):
+        n = self._n
+        np.savez_compressed(self._path, frame_id=self._frame_id[:n], timestamp=self._timestamp[:n],
+                            landmarks=self._landmarks[:n], handedness=self._handedness[:n], score=self._score[:n])
+
+
+def load_landmarks(path):
+    """
+    :param path: npz file saved by LandmarkRecorder
+    :return: dict with frame_id, timestamp, landmarks (n x 21 x 3), handedness (0 left, 1 right, -1 none), score
+    """
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+class SessionRecorder:
+    """
+    Class that records a session: raw frames from the capture thread (VideoRecorder) and hand landmarks from the
+    pose estimation thread (LandmarkRecorder). Files: <prefix>Video.avi (or <prefix>Video/ with JPEG images),
+    <prefix>Video_frames.npz and <prefix>Landmarks.npz
+    """
+
+    def __init__(self, prefix, fps=30.0, jpeg=False, max_pending=32):
+        """
+        :param prefix: path and beginning of the name of the files (e.g. drPath + "Calib")
+        :param fps: rate written in the header of the video file
+        :param jpeg: save JPEG images instead of a video file
+        :param max_pending: frames waiting to be encoded before new frames are dropped
+        """
+        directory = os.path.dirname(prefix)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        video_path = prefix + "Video" + ("/" if jpeg else ".avi")
+        self._video = VideoRecorder(video_path, fps=fps, jpeg=jpeg, max_pending=max_pending)
+        self._landmarks = LandmarkRecorder(prefix + "Landmarks.npz")
+
+    @property
+    def video(self):
+        return self._video
+
+    @property
+    def landmarks(self):
+        return self._landmarks
+
+    def record_frame(self, frame, frame_id, timestamp=None):
+        return self._video.record(frame, frame_id, timestamp)
+
+    def record_landmarks(self, results, frame_id, timestamp):
+        return self._landmarks.record(results, frame_id, timestamp)
+
+    def close(self):
+        self._video.close()
+        self._landmarks.save()
+        print('Session recorded. Frames ' + self._video.stats() + ', landmarks: ' + str(self._landmarks.frames))
+
+
+def reprocess(video_path, landmarks_path, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    """
+    run pose estimation again on a recorded video, e.g. with different confidence thresholds
+    :param video_path: video (or JPEG directory) saved by VideoRecorder
+    :param landmarks_path: output npz file (same format as LandmarkRecorder)
+    :return: number of frames with a detected hand, number of frames
+    """
+    import mediapipe as mp
+    from frame_source import open_frame_source
+    from frame_preprocessor import FramePreprocessor
+
+    with np.load(os.path.splitext(video_path.rstrip('/'))[0] + '_frames.npz') as index:
+        frame_id = index['frame_id']
+        timestamp = index['timestamp']
+    recorder = LandmarkRecorder(landmarks_path, capacity=max(frame_id.shape[0], 1))
+    hands = mp.solutions.hands.Hands(min_detection_confidence=min_detection_confidence,
+                                     min_tracking_confidence=min_tracking_confidence, max_num_hands=1)
+    detected = 0
+    preprocessor = FramePreprocessor()
+    frame = None
+    with open_frame_source(video_path, fps=0) if os.path.isdir(video_path) else \
+            open_frame_source(video_path, realtime=False) as src:
+        for k in range(frame_id.shape[0]):
+            ret, frame = src.read(frame)
+            if not ret:
+                break
+            # same preprocessing as online (selfie-view landmarks)
+            results = hands.process(preprocessor.convert(frame))
+            preprocessor.mirror(results)
+            detected += recorder.record(results, frame_id[k], timestamp[k])
+    hands.close()
+    recorder.save()
+    return detected, recorder.frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pose estimation again on a recorded session")
+    parser.add_argument("video", help="video file or JPEG directory saved by the session recorder")
+    parser.add_argument("output", help="output landmark file (.npz)")
+    parser.add_argument("--min-detection", type=float, default=0.5, help="min_detection_confidence")
+    parser.add_argument("--min-tracking", type=float, default=0.5, help="min_tracking_confidence")
+    args = parser.parse_args()
+
+    n_detected, n_frames = reprocess(args.video, args.output, args.min_detection, args.min_tracking)
+    print("hand detected in " + str(n_detected) + "/" + str(n_frames) + " frames")
@@ -8,8 +8,11 @@ class StopWatch:
         self._pause_time = 0
         self._elapsed_pause = 0
 
+    def _now(self):
+        return time.perf_counter_ns() * 10**-6
+
     def start(self):
-        self._start_time = time.perf_counter_ns() * 10**-6
+        self._start_time = self._now()
 
     @property
     def start_time(self):
@@ -21,7 +24,7 @@ class StopWatch:
 
     @property
     def elapsed_time(self):
-        self._elapsed_time = time.perf_counter_ns() * 10 ** -6 - self._start_time - self._elapsed_pause
+        self._elapsed_time = self._now() - self._start_time - self._elapsed_pause
         return self._elapsed_time
 
     @property
@@ -29,7 +32,38 @@ class StopWatch:
         return self._elapsed_pause
 
     def pause(self):
-        self._pause_time = time.perf_counter_ns() * 10 ** -6
+        self._pause_time = self._now()
 
     def restart(self):
-        self._elapsed_pause += (time.perf_counter_ns() * 10 ** -6 - self._pause_time)
+        self._elapsed_pause += (self._now() - self._pause_time)
+
+
+class SimulatedClock:
+    """
+    Class that keeps a simulated time [ms], advanced explicitly (used when replaying a session offline)
+    """
+    def __init__(self, start=0.0):
+        self._time = start
+
+    @property
+    def time(self):
+        return self._time
+
+    @time.setter
+    def time(self, value):
+        self._time = value
+
+    def advance(self, dt):
+        self._time += dt
+
+
+class SimulatedStopWatch(StopWatch):
+    """
+    StopWatch that reads the time of a SimulatedClock instead of the system clock
+    """
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def _now(self):
+        return self._clock.time